@@ -0,0 +1,239 @@
+"""Local cache of arrival predictions.
+
+This module keeps the arrival predictions of the last fetch together with the
+tick at which they were fetched, so the countdowns can be decremented locally
+between network round-trips and trains that have departed can be dropped.
+Predictions are stored in a compact array-backed container that keeps only
+the soonest ones while a response is being parsed, with platform numbers and
+destinations interned in a string table that persists across refreshes.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+from array import array
+
+
+class StringTable:
+    def __init__(self) -> None:
+        """
+        Initialize an empty table of interned strings.
+
+        Platform numbers and destinations at the configured stations are a small fixed set,
+        so the table is kept for the lifetime of the app and each string is allocated once.
+        """
+        self._strings = []
+        self._index = {}
+
+    def intern(self, string: str) -> int:
+        """
+        Get the index of a string, adding it to the table if needed.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            int: The index of the string in the table.
+        """
+        i = self._index.get(string)
+        if i is None:
+            i = len(self._strings)
+            self._strings.append(string)
+            self._index[string] = i
+        return i
+
+    def __getitem__(self, i: int) -> str:
+        return self._strings[i]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class Arrivals:
+    duplicate_tolerance = 30  # seconds within which two predictions for one vehicle are the same train
+
+    def __init__(self, strings: StringTable, limit: int | None = None, sort: bool = True) -> None:
+        """
+        Initialize an empty, compact container of arrival predictions.
+
+        Times are stored in an array('H') and platforms and destinations as indices into `strings`,
+        so a refresh allocates no new Python objects per prediction.
+
+        Args:
+            strings (StringTable): The table interning platform numbers and destinations.
+            limit (int, optional): The maximum number of predictions kept. Defaults to None (no limit).
+            sort (bool, optional): Whether to keep the predictions sorted by time_to_station and
+                keep the soonest ones. If False, the first `limit` predictions are kept in order. Defaults to True.
+        """
+        self.strings = strings
+        self.limit = limit
+        self.sort = sort
+        self.times = array('H')  # time to station in seconds
+        self.platforms = array('H')  # platform number indices into strings
+        self.destinations = array('H')  # destination indices into strings
+        self.vehicles = []  # vehicle ID of each kept prediction, to drop duplicates while parsing
+        self.fetched = time.ticks_ms()  # the predictions' times are relative to this tick
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def add(self, platform_number: str, time_to_station: int, destination: str, vehicle_id: str | None = None) -> bool:
+        """
+        Add a prediction if it is among the soonest `limit` ones seen so far.
+
+        Two predictions for one vehicle with times within `duplicate_tolerance` are the
+        same train, e.g. reported under two lines that share the track; only the sooner
+        one is kept, whatever order the API lists them in.
+
+        Args:
+            platform_number (str): The platform number.
+            time_to_station (int): The time to station in seconds.
+            destination (str): The destination.
+            vehicle_id (str, optional): The vehicle ID. Defaults to None (no deduplication).
+
+        Returns:
+            bool: True if the prediction was kept.
+        """
+        time_to_station = min(max(time_to_station, 0), 0xffff)
+        if vehicle_id:
+            for j in range(len(self.vehicles)):
+                if self.vehicles[j] == vehicle_id and abs(self.times[j] - time_to_station) <= self.duplicate_tolerance:
+                    if time_to_station >= self.times[j]:
+                        return False
+                    self._remove(j)  # the sooner prediction replaces it below
+                    break
+        n = len(self.times)
+        full = self.limit is not None and n >= self.limit
+        if not self.sort:
+            if full:
+                return False
+            i = n
+        else:
+            if full and time_to_station >= self.times[-1]:
+                return False
+            # insertion point after any equal times, keeping the order of arrival
+            i = n
+            while i > 0 and self.times[i-1] > time_to_station:
+                i -= 1
+
+        if full:
+            last = n - 1  # the latest prediction is dropped
+            self.vehicles.pop()
+        else:
+            last = n
+            self.times.append(0)
+            self.platforms.append(0)
+            self.destinations.append(0)
+        for j in range(last, i, -1):
+            self.times[j] = self.times[j-1]
+            self.platforms[j] = self.platforms[j-1]
+            self.destinations[j] = self.destinations[j-1]
+        self.times[i] = time_to_station
+        self.platforms[i] = self.strings.intern(platform_number)
+        self.destinations[i] = self.strings.intern(destination)
+        self.vehicles.insert(i, vehicle_id)
+        return True
+
+    def _remove(self, i: int) -> None:
+        for j in range(i, len(self.times) - 1):
+            self.times[j] = self.times[j+1]
+            self.platforms[j] = self.platforms[j+1]
+            self.destinations[j] = self.destinations[j+1]
+        self.times.pop()
+        self.platforms.pop()
+        self.destinations.pop()
+        self.vehicles.pop(i)
+
+    def platform_number(self, i: int) -> str:
+        """The platform number of the i-th prediction."""
+        return self.strings[self.platforms[i]]
+
+    def time_to_station(self, i: int) -> int:
+        """The time to station in seconds of the i-th prediction, at the time of the fetch."""
+        return self.times[i]
+
+    def destination(self, i: int) -> str:
+        """The destination of the i-th prediction."""
+        return self.strings[self.destinations[i]]
+
+    def same_platform(self) -> bool:
+        """
+        Check whether all predictions are for the same platform.
+
+        Returns:
+            bool: True if all predictions share a platform (or there are none).
+        """
+        return all(x == self.platforms[0] for x in self.platforms)
+
+    def lists(self) -> tuple[list[str], list[int], list[str]]:
+        """
+        Get the predictions as lists.
+
+        Returns:
+            tuple: A tuple containing lists of platform numbers, time to station, and destination.
+        """
+        return ([self.platform_number(i) for i in range(len(self))],
+                list(self.times),
+                [self.destination(i) for i in range(len(self))])
+
+
+class ArrivalsCache:
+    def __init__(self) -> None:
+        """
+        Initialize an empty ArrivalsCache.
+        """
+        self.arrivals = None
+        self.fetched = None  # time.ticks_ms() of the last update
+
+    def update(self, arrivals: Arrivals) -> None:
+        """
+        Replace the cached predictions with the result of a fetch.
+
+        The age is taken from the predictions, so last good predictions served again
+        while the API is failing keep counting down from their original fetch.
+
+        Args:
+            arrivals (Arrivals): The predictions, with times at the time of the fetch.
+        """
+        self.arrivals = arrivals
+        self.fetched = arrivals.fetched
+
+    def age(self) -> int | None:
+        """
+        Get the age of the cached predictions.
+
+        Returns:
+            int or None: Seconds since the last update, or None if nothing has been fetched yet.
+        """
+        if self.fetched is None:
+            return None
+        return time.ticks_diff(time.ticks_ms(), self.fetched) // 1000
+
+    def same_platform(self) -> bool:
+        """
+        Check whether all cached predictions are for the same platform.
+
+        Returns:
+            bool: True if all predictions share a platform (or there are none).
+        """
+        return self.arrivals is None or self.arrivals.same_platform()
+
+    def upcoming(self):
+        """
+        Iterate over the cached predictions with the countdowns extrapolated to now.
+
+        Trains whose extrapolated time to station has passed are skipped.
+
+        Yields:
+            tuple: (platform number, time to station in seconds, destination)
+        """
+        if self.arrivals is None:
+            return
+        arrivals = self.arrivals
+        elapsed = self.age()
+        for i in range(len(arrivals)):
+            remaining = arrivals.times[i] - elapsed
+            if remaining < 0:
+                continue  # departed
+            yield arrivals.platform_number(i), remaining, arrivals.destination(i)
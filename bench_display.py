@@ -0,0 +1,85 @@
+"""Microbenchmark of the display frame push.
+
+Run it on the Pico W with the display attached, e.g. `mpremote run bench_display.py`.
+It times `show()` for a full frame, a redrawn departure board (also written to
+the hidden half of the display RAM and swapped in), a ticking clock and an
+unchanged frame, with frame diffing on and off, and prints the mean and
+worst push time of each in microseconds.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+import gc
+import font
+from writer import Writer
+from waveshare_pico_oled_1p3inch import PICO_OLED_1P3INCH
+
+REPEAT = 20  # pushes timed per case
+
+
+def time_show(screen, draw, full_update: bool = False, swap: bool = False, repeat: int = REPEAT) -> tuple[int, int]:
+    """
+    Time `screen.show()` after each of `repeat` redraws.
+
+    Args:
+        screen (PICO_OLED_1P3INCH): The display.
+        draw (function): Called with the iteration number to draw the next frame, not timed.
+        full_update (bool, optional): Passed to `show()`. Defaults to False.
+        swap (bool, optional): Passed to `show()`. Defaults to False.
+        repeat (int, optional): The number of pushes to time. Defaults to REPEAT.
+
+    Returns:
+        tuple: The mean and worst push time in microseconds.
+    """
+    total = 0
+    worst = 0
+    for i in range(repeat):
+        draw(i)
+        gc.collect()
+        start = time.ticks_us()
+        screen.show(full_update, swap)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        total += elapsed
+        worst = max(worst, elapsed)
+    return total // repeat, worst
+
+
+def main() -> None:
+    screen = PICO_OLED_1P3INCH(rotate=180)
+    writer = Writer(screen, font, verbose=False)
+    last = writer.get_num_lines() - 1
+
+    def board(i):
+        # what a departure board refresh does: clear, then redraw every line
+        screen.clear()
+        writer.mytext("Westbound", 0)
+        writer.mytext_both_side("1 Hammersmith", f"{i % 10 + 1}min", 1)
+        writer.mytext_both_side("2 Edgware Road", f"{i % 10 + 4}min", 2)
+        writer.mytext_both_side("3 Hammersmith", f"{i % 10 + 9}min", 3)
+        writer.mytext_both_side("Good", f"12:{i % 60:02d}", last)
+
+    def clock(i):
+        # only the minute digits change
+        writer.clear_line(last)
+        writer.mytext_both_side("Good", f"12:{i % 60:02d}", last)
+
+    cases = [("full frame", lambda i: None, True, False),
+             ("board redraw", board, False, False),
+             ("board redraw, swapped", board, False, True),
+             ("clock tick", clock, False, False),
+             ("unchanged", lambda i: None, False, False)]
+    board(0)
+    screen.show(True)
+    for diff in (True, False):
+        screen.diff_updates = diff
+        print(f"frame diffing {'on' if diff else 'off'}")
+        for name, draw, full_update, swap in cases:
+            mean, worst = time_show(screen, draw, full_update, swap)
+            print(f"  {name}: {mean}us mean, {worst}us worst")
+    screen.diff_updates = True
+    screen.clear(now=True)
+
+
+main()
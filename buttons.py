@@ -0,0 +1,54 @@
+"""Debounced push buttons latched by pin interrupts.
+
+A press is recorded by the pin IRQ as soon as it happens, so it is not lost
+while the app is busy drawing or waiting on the network, and is handled the
+next time the board polls the button.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+from machine import Pin
+import time
+
+
+class Button:
+    debounce_ms = 200  # presses closer together than this are ignored
+
+    def __init__(self, pin: Pin) -> None:
+        """
+        Initialize a Button on an input pin with a pull-up (pressed reads 0).
+
+        Args:
+            pin (Pin): The input pin of the button.
+        """
+        self.pin = pin
+        self._pressed = False
+        self._last_press = time.ticks_ms()
+        pin.irq(trigger=Pin.IRQ_FALLING, handler=self._irq)
+
+    def _irq(self, pin: Pin) -> None:
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._last_press) > self.debounce_ms:
+            self._pressed = True
+            self._last_press = now
+
+    def pressed(self) -> bool:
+        """
+        Check and clear the press latch.
+
+        Returns:
+            bool: True if the button was pressed since the last call.
+        """
+        pressed = self._pressed
+        self._pressed = False
+        return pressed
+
+    def value(self) -> int:
+        """
+        Read the pin level, 0 while the button is held down.
+
+        Returns:
+            int: The pin value.
+        """
+        return self.pin.value()
@@ -0,0 +1,114 @@
+"""Failure tracking and circuit breaking for the API endpoints.
+
+Each endpoint (line status, arrivals at a station, weather) has a
+CircuitBreaker counting its consecutive failures. After a few failures the
+circuit opens and no requests are sent to the endpoint until an
+exponentially growing backoff has passed; the next request is then a trial
+that closes the circuit again if it succeeds. While a circuit is open the API
+wrappers serve the last good data instead, so boards keep showing it with
+its age rather than the app restarting.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+from ratelimit import RateLimited
+from jsonstream import BadResponse
+
+
+class CircuitOpen(Exception):
+    """Raised when a request is not sent because its endpoint's circuit is open."""
+    pass
+
+
+# errors caused by the network or a bad response, worth retrying later;
+# anything else is a bug and is not retried
+TRANSIENT_ERRORS = (OSError, BadResponse, RateLimited, CircuitOpen)
+
+
+class CircuitBreaker:
+    failure_threshold = 2  # consecutive failures that open the circuit
+    base_backoff = 5  # seconds the circuit stays open after opening
+    max_backoff = 300  # the backoff doubles with each further failure up to this
+
+    def __init__(self, name: str) -> None:
+        """
+        Initialize a closed CircuitBreaker.
+
+        Args:
+            name (str): The name of the endpoint, used in error messages.
+        """
+        self.name = name
+        self.failures = 0  # consecutive failures
+        self.last_error = None
+        self._open_until = None  # time.ticks_ms() at which a trial request is allowed
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be sent.
+
+        Returns:
+            bool: True if the circuit is closed or its backoff has passed.
+        """
+        return self._open_until is None or time.ticks_diff(time.ticks_ms(), self._open_until) >= 0
+
+    def retry_in(self) -> int:
+        """
+        Get the time until the next request is allowed.
+
+        Returns:
+            int: Seconds until a trial request, 0 if requests are allowed now.
+        """
+        if self.allow():
+            return 0
+        return (time.ticks_diff(self._open_until, time.ticks_ms()) + 999) // 1000
+
+    def success(self) -> None:
+        """
+        Record a successful request, closing the circuit.
+        """
+        self.failures = 0
+        self.last_error = None
+        self._open_until = None
+
+    def failure(self, error: Exception) -> None:
+        """
+        Record a failed request, opening the circuit after `failure_threshold` failures.
+
+        Args:
+            error (Exception): The error of the request.
+        """
+        self.failures += 1
+        self.last_error = error
+        if self.failures >= self.failure_threshold:
+            backoff = min(self.base_backoff * 2 ** (self.failures - self.failure_threshold),
+                          self.max_backoff)
+            self._open_until = time.ticks_add(time.ticks_ms(), backoff * 1000)
+            print(f"{self.name}: {error}, retry in {backoff}s")
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call `func` if the circuit allows it and record the outcome.
+
+        Only TRANSIENT_ERRORS count as failures; RateLimited and any other exception are
+        raised without being recorded.
+
+        Returns:
+            The return value of `func`.
+
+        Raises:
+            CircuitOpen: If the circuit is open.
+            Exception: Any exception raised by `func`.
+        """
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} retry in {self.retry_in()}s")
+        try:
+            result = func(*args, **kwargs)
+        except RateLimited:
+            raise  # our own budget, not a failure of the endpoint
+        except TRANSIENT_ERRORS as e:
+            self.failure(e)
+            raise
+        self.success()
+        return result
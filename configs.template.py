@@ -15,4 +15,19 @@ WEATHER_LON = -0.118092
 # ntp server and time offset
 NTP_SERVER = "pool.ntp.org" # could use local ntp server
 # TZ_OFFSET = 0 # UTC
-TZ_OFFSET = 1 # BST
\ No newline at end of file
+TZ_OFFSET = 1 # BST
+
+# local hours without any API requests, e.g. (1, 5) for 1am to 5am, or None
+QUIET_HOURS = None
+
+# API request budgets of this board, in requests per minute
+TFL_REQUESTS_PER_MINUTE = 50
+WEATHER_REQUESTS_PER_MINUTE = 10
+
+# run network requests on the second core so the display never waits on them;
+# with False every request blocks the buttons, clock and redraws until it returns
+NETWORK_THREAD = True
+
+# fetch the data of the highlighted menu board and its neighbours while the menu is idle;
+# needs NETWORK_THREAD, ignored without it
+PREFETCH = False
\ No newline at end of file
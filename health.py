@@ -0,0 +1,105 @@
+"""Health of the API hosts, measured from the requests the app already makes.
+
+The HTTPClient records the outcome and round-trip time of every request in a
+HealthMonitor, so diagnostics can report each API's status, latency and
+success rate without sending requests of their own. A probe is only needed
+when a host has not been used for a while.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+
+
+class HostHealth:
+    window = 20  # most recent requests counted in the success rate
+    rtt_smoothing = 0.125  # weight of the newest round-trip time in the smoothed one
+
+    def __init__(self) -> None:
+        """
+        Initialize the health of a host with no requests recorded.
+        """
+        self.status_code = None  # of the last request, None if it failed without a response
+        self.error = None  # error of the last request, None if it got a response
+        self.rtt_ms = None  # smoothed round-trip time of the requests that got a response
+        self.last_request = None  # time.ticks_ms() of the last request
+        self._history = 0  # bit i set if the i-th most recent request succeeded
+        self._count = 0  # requests in the history
+
+    def record(self, status_code: int | None, rtt_ms: int, error: Exception | None = None) -> None:
+        """
+        Record the outcome of a request.
+
+        Args:
+            status_code (int or None): The HTTP status code, None if the request failed.
+            rtt_ms (int): Milliseconds from sending the request to receiving the response headers.
+            error (Exception, optional): The error of a failed request. Defaults to None.
+        """
+        self.status_code = status_code
+        self.error = error
+        self.last_request = time.ticks_ms()
+        ok = status_code == 200
+        self._history = ((self._history << 1) | ok) & ((1 << self.window) - 1)
+        self._count = min(self._count + 1, self.window)
+        if status_code is not None:
+            if self.rtt_ms is None:
+                self.rtt_ms = rtt_ms
+            else:
+                self.rtt_ms += int((rtt_ms - self.rtt_ms) * self.rtt_smoothing)
+
+    @property
+    def ok(self) -> bool:
+        """Whether the last request got a 200 OK response."""
+        return self.status_code == 200
+
+    def success_rate(self) -> int | None:
+        """
+        Get the share of recent requests that succeeded.
+
+        Returns:
+            int or None: The percentage of the last `window` requests that got a 200 OK, None if there were none.
+        """
+        if not self._count:
+            return None
+        return bin(self._history).count("1") * 100 // self._count
+
+    def idle(self) -> int | None:
+        """
+        Get the time since the last request.
+
+        Returns:
+            int or None: Seconds since the last request, or None if there was none.
+        """
+        if self.last_request is None:
+            return None
+        return time.ticks_diff(time.ticks_ms(), self.last_request) // 1000
+
+
+class HealthMonitor:
+    def __init__(self) -> None:
+        """
+        Initialize a HealthMonitor with no hosts.
+        """
+        self.hosts = {}  # host -> HostHealth
+
+    def record(self, host: str, status_code: int | None, rtt_ms: int, error: Exception | None = None) -> None:
+        """
+        Record the outcome of a request to `host`. See `HostHealth.record()`.
+        """
+        health = self.hosts.get(host)
+        if health is None:
+            health = self.hosts[host] = HostHealth()
+        health.record(status_code, rtt_ms, error)
+
+    def get(self, host: str) -> HostHealth | None:
+        """
+        Get the health of a host.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            HostHealth or None: The health of the host, None if no request to it was recorded.
+        """
+        return self.hosts.get(host)
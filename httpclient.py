@@ -0,0 +1,316 @@
+"""A minimal HTTP/1.1 client with persistent connections.
+
+This module replaces per-call `urequests.get` with a client that keeps one
+connection per host open between requests, so the TLS handshake is only paid
+once. Response bodies are read with Content-Length and chunked transfer
+encoding awareness, and a pooled connection that was reset by the server is
+reconnected transparently. All requests can be routed through a RateLimiter,
+and their outcome and round-trip time recorded in a HealthMonitor.
+Responses other than 200 OK can be turned into an HTTPError.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import socket
+import time
+import ujson
+from ratelimit import FOREGROUND
+from jsonstream import BadResponse
+try:
+    import ssl
+except ImportError:
+    import ussl as ssl
+
+
+class HTTPError(OSError):
+    def __init__(self, status_code: int) -> None:
+        """
+        Initialize an HTTPError for a response that was not 200 OK.
+
+        Args:
+            status_code (int): The HTTP status code.
+        """
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Response:
+    drain_limit = 4096  # Unread body bytes close() reads so the connection can still be reused
+
+    def __init__(self, client, host: str, sock, status_code: int, headers: dict) -> None:
+        """
+        Initialize a Response whose body is read from `sock`.
+
+        Args:
+            client (HTTPClient): The client that owns the connection.
+            host (str): The pool key of the connection, "host:port".
+            sock: The connected socket.
+            status_code (int): The HTTP status code.
+            headers (dict): The response headers, with lower-case names.
+        """
+        self._client = client
+        self._host = host
+        self._sock = sock
+        self.status_code = status_code
+        self.headers = headers
+        self._keep_alive = headers.get("connection", "").lower() != "close"
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self._chunk_remaining = 0
+        if "content-length" in headers:
+            self._remaining = int(headers["content-length"])
+        else:
+            self._remaining = None
+            if not self._chunked:
+                self._keep_alive = False  # body ends when the server closes the connection
+        self._done = self._remaining == 0
+
+    @property
+    def raw(self):
+        """The response itself, for code written against `urequests` responses."""
+        return self
+
+    def readinto(self, buf) -> int:
+        """
+        Read part of the body into a buffer.
+
+        Args:
+            buf (bytearray or memoryview): The buffer to fill.
+
+        Returns:
+            int: The number of bytes read, 0 at the end of the body.
+        """
+        if self._done:
+            return 0
+        mv = memoryview(buf)
+        if self._chunked:
+            if self._chunk_remaining == 0:
+                line = self._sock.readline()
+                try:
+                    size = int(line.split(b";")[0], 16)
+                except ValueError:
+                    raise BadResponse(f"bad chunk size {line}")
+                if size == 0:
+                    # skip trailers until the blank line
+                    while self._sock.readline() not in (b"\r\n", b""):
+                        pass
+                    self._done = True
+                    return 0
+                self._chunk_remaining = size
+            n = self._sock.readinto(mv[:min(len(mv), self._chunk_remaining)])
+            if not n:
+                raise OSError("connection closed mid-chunk")
+            self._chunk_remaining -= n
+            if self._chunk_remaining == 0:
+                self._sock.readline()  # CRLF after the chunk data
+            return n
+        if self._remaining is None:
+            n = self._sock.readinto(mv)
+            if not n:
+                self._done = True
+                return 0
+            return n
+        n = self._sock.readinto(mv[:min(len(mv), self._remaining)])
+        if not n:
+            raise OSError("connection closed before Content-Length")
+        self._remaining -= n
+        if self._remaining == 0:
+            self._done = True
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read the body.
+
+        Args:
+            size (int, optional): The maximum number of bytes to read. Defaults to -1 (all).
+
+        Returns:
+            bytes: The bytes read.
+        """
+        data = bytearray()
+        buf_mv = memoryview(bytearray(256))
+        while size < 0 or len(data) < size:
+            want = len(buf_mv) if size < 0 else min(len(buf_mv), size - len(data))
+            n = self.readinto(buf_mv[:want])
+            if not n:
+                break
+            data.extend(buf_mv[:n])
+        return bytes(data)
+
+    def json(self):
+        """
+        Read the whole body and decode it as JSON.
+
+        Returns:
+            The decoded JSON document.
+
+        Raises:
+            BadResponse: If the body is not valid JSON.
+        """
+        try:
+            return ujson.loads(self.read())
+        except ValueError as e:
+            raise BadResponse(f"bad JSON: {e}")
+
+    def raise_for_status(self) -> None:
+        """
+        Close the response and raise an HTTPError unless it is 200 OK.
+
+        Raises:
+            HTTPError: If the status code is not 200.
+        """
+        if self.status_code != 200:
+            self.close()
+            raise HTTPError(self.status_code)
+
+    def close(self) -> None:
+        """
+        Release the connection, returning it to the pool if it can be reused.
+
+        A body left unread, such as after a status check or an early stop, is read to its
+        end first when it is at most `drain_limit` bytes, so the connection is kept.
+        """
+        if self._sock is None:
+            return
+        if self._keep_alive and not self._done:
+            self._drain()
+        if self._done and self._keep_alive:
+            self._client._release(self._host, self._sock)
+        else:
+            self._sock.close()
+        self._sock = None
+
+    def _drain(self) -> None:
+        """
+        Internal function to read the rest of a short body and discard it.
+        """
+        if self._remaining is not None and self._remaining > self.drain_limit:
+            return
+        buf = bytearray(256)
+        left = self.drain_limit
+        try:
+            while not self._done and left > 0:
+                left -= self.readinto(buf)
+        except (OSError, BadResponse):
+            self._keep_alive = False
+
+
+class HTTPClient:
+    timeout = 10  # socket timeout in seconds
+
+    def __init__(self, limiter=None, health=None) -> None:
+        """
+        Initialize an HTTPClient with an empty connection pool.
+
+        Args:
+            limiter (RateLimiter, optional): The rate limiter every request goes through. Defaults to None.
+            health (HealthMonitor, optional): Where the outcome of every request is recorded. Defaults to None.
+        """
+        self._pool = {}  # "host:port" -> idle socket
+        self.limiter = limiter
+        self.health = health
+
+    def _connect(self, host: str, port: int, tls: bool):
+        addr = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][-1]
+        sock = socket.socket()
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(addr)
+            if tls:
+                sock = ssl.wrap_socket(sock, server_hostname=host)
+        except:
+            sock.close()
+            raise
+        return sock
+
+    def _release(self, key: str, sock) -> None:
+        idle = self._pool.get(key)
+        if idle is not None:
+            idle.close()  # only keep one connection per host
+        self._pool[key] = sock
+
+    def get(self, url: str, headers: dict | None = None, priority: int = FOREGROUND) -> Response:
+        """
+        Send a GET request.
+
+        Args:
+            url (str): The URL, starting with http:// or https://.
+            headers (dict, optional): Extra request headers. Defaults to None.
+            priority (int, optional): The priority of the request for the rate limiter, FOREGROUND or BACKGROUND.
+                Defaults to FOREGROUND.
+
+        Returns:
+            Response: The response. Call `close()` on it to release the connection.
+
+        Raises:
+            RateLimited: If the limiter refuses the request.
+        """
+        scheme, _, host, path = url.split("/", 3)
+        tls = scheme == "https:"
+        port = 443 if tls else 80
+        if ":" in host:
+            host, port = host.split(":", 1)
+            port = int(port)
+        key = f"{host}:{port}"
+        if self.limiter is not None:
+            self.limiter.acquire(host, priority)
+
+        request = f"GET /{path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+        if headers:
+            for name in headers:
+                request += f"{name}: {headers[name]}\r\n"
+        request = (request + "\r\n").encode()
+
+        start = time.ticks_ms()
+        try:
+            response = self._request(key, host, port, tls, request)
+        except OSError as e:
+            if self.health is not None:
+                self.health.record(host, None, time.ticks_diff(time.ticks_ms(), start), e)
+            raise
+        if self.health is not None:
+            self.health.record(host, response.status_code,
+                               time.ticks_diff(time.ticks_ms(), start))
+        return response
+
+    def _request(self, key: str, host: str, port: int, tls: bool, request: bytes) -> Response:
+        sock = self._pool.pop(key, None)
+        if sock is not None:
+            # the server may have closed an idle connection, retry once on a fresh one
+            try:
+                return self._send(key, sock, request)
+            except OSError:
+                sock.close()
+        sock = self._connect(host, port, tls)
+        try:
+            return self._send(key, sock, request)
+        except:
+            sock.close()
+            raise
+
+    def _send(self, key: str, sock, request: bytes) -> Response:
+        sock.write(request)
+        status_line = sock.readline()
+        if not status_line:
+            raise OSError("connection closed by server")
+        try:
+            status_code = int(status_line.split(None, 2)[1])
+        except (ValueError, IndexError):
+            raise BadResponse(f"bad status line {status_line}")
+        headers = {}
+        while True:
+            line = sock.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return Response(self, key, sock, status_code, headers)
+
+    def close(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        for sock in self._pool.values():
+            sock.close()
+        self._pool = {}
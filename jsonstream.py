@@ -0,0 +1,207 @@
+"""A small streaming JSON extractor for MicroPython.
+
+This module reads a JSON document from a stream in fixed-size chunks and
+extracts only the requested keys from each object at a given depth, so the
+whole payload never has to be built as Python objects on the heap.
+
+For each item object, the first occurrence of each requested key (at any
+nesting level inside the item) is kept. Only scalar values (strings, numbers,
+booleans and null) are extracted.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+from micropython import const
+
+_QUOTE = const(0x22)  # "
+_BACKSLASH = const(0x5c)  # \
+_COLON = const(0x3a)  # :
+_COMMA = const(0x2c)  # ,
+_OPEN_OBJECT = const(0x7b)  # {
+_CLOSE_OBJECT = const(0x7d)  # }
+_OPEN_ARRAY = const(0x5b)  # [
+_CLOSE_ARRAY = const(0x5d)  # ]
+
+_WHITESPACE = b" \t\r\n"
+_ESCAPES = {0x62: 0x08, 0x66: 0x0c, 0x6e: 0x0a, 0x72: 0x0d, 0x74: 0x09}
+
+
+class BadResponse(ValueError):
+    """Raised when an API response cannot be parsed or lacks an expected field."""
+    pass
+
+
+class JSONExtractor:
+    """
+    Incremental JSON parser that keeps only the requested keys.
+
+    Feed the document with `feed()` in chunks of any size; completed records
+    are appended to `records` as dicts.
+    """
+
+    def __init__(self, keys: list[str], depth: int = 1) -> None:
+        """
+        Initialize the extractor.
+
+        Args:
+            keys (list[str]): The keys to extract from each item.
+            depth (int, optional): The nesting depth of the item objects. Defaults to 1
+                (the objects of a top-level array).
+        """
+        self.keys = {key.encode(): key for key in keys}
+        self.depth = depth
+        self.records = []
+        self._stack = bytearray()  # b"{" or b"[" for each open container
+        self._record = None
+        self._buf = bytearray()
+        self._in_string = False
+        self._escape = False
+        self._unicode = 0  # remaining hex digits of a \uXXXX escape
+        self._unicode_value = 0
+        self._buffering = False  # whether string bytes are being kept
+        self._expect_key = False
+        self._key = None
+        self._capture = None  # key whose value is being extracted
+        self._scalar = False  # extracting a number or literal
+
+    def feed(self, data) -> None:
+        """
+        Parse a chunk of the document.
+
+        Args:
+            data (bytes, bytearray or memoryview): The next chunk of the document.
+
+        Raises:
+            BadResponse: If the chunk is not valid JSON.
+        """
+        try:
+            self._feed(data)
+        except ValueError as e:  # malformed number, escape or UTF-8
+            raise BadResponse(f"bad JSON: {e}")
+
+    def _feed(self, data) -> None:
+        for c in data:
+            if self._in_string:
+                self._string_char(c)
+                continue
+
+            if self._scalar:
+                if c in _WHITESPACE or c == _COMMA or c == _CLOSE_OBJECT or c == _CLOSE_ARRAY:
+                    self._end_scalar()
+                else:
+                    self._buf.append(c)
+                    continue
+
+            if c in _WHITESPACE:
+                continue
+            if c == _QUOTE:
+                self._in_string = True
+                self._buffering = self._record is not None and (
+                    self._expect_key or self._capture is not None)
+                if self._buffering:
+                    self._buf = bytearray()
+            elif c == _COLON:
+                self._expect_key = False
+                if self._key is not None and self._key in self.keys:
+                    key = self.keys[self._key]
+                    if key not in self._record:
+                        self._capture = key
+                self._key = None
+            elif c == _COMMA:
+                self._capture = None
+                self._expect_key = len(self._stack) > 0 and self._stack[-1] == _OPEN_OBJECT
+            elif c == _OPEN_OBJECT or c == _OPEN_ARRAY:
+                self._capture = None  # only scalars are extracted
+                if c == _OPEN_OBJECT and self._record is None and len(self._stack) == self.depth:
+                    self._record = {}
+                self._stack.append(c)
+                self._expect_key = c == _OPEN_OBJECT
+            elif c == _CLOSE_OBJECT or c == _CLOSE_ARRAY:
+                self._capture = None
+                self._expect_key = False
+                if len(self._stack) > 0:
+                    self._stack.pop()
+                if c == _CLOSE_OBJECT and self._record is not None and len(self._stack) == self.depth:
+                    self.records.append(self._record)
+                    self._record = None
+            elif self._capture is not None:
+                self._scalar = True
+                self._buf = bytearray()
+                self._buf.append(c)
+
+    def _string_char(self, c: int) -> None:
+        if self._unicode:
+            self._unicode_value = (self._unicode_value << 4) | int(chr(c), 16)
+            self._unicode -= 1
+            if not self._unicode and self._buffering:
+                value = self._unicode_value
+                if 0xd800 <= value <= 0xdfff:
+                    value = 0x3f  # surrogate pairs are not supported, use "?"
+                self._buf.extend(chr(value).encode())
+        elif self._escape:
+            self._escape = False
+            if c == 0x75:  # u
+                self._unicode = 4
+                self._unicode_value = 0
+            elif self._buffering:
+                self._buf.append(_ESCAPES.get(c, c))
+        elif c == _BACKSLASH:
+            self._escape = True
+        elif c == _QUOTE:
+            self._in_string = False
+            self._end_string()
+        elif self._buffering:
+            self._buf.append(c)
+
+    def _end_string(self) -> None:
+        if self._expect_key:
+            self._key = bytes(self._buf) if self._buffering else None
+        elif self._capture is not None:
+            self._record[self._capture] = self._buf.decode()
+            self._capture = None
+        self._buffering = False
+
+    def _end_scalar(self) -> None:
+        self._scalar = False
+        value = bytes(self._buf)
+        if value == b"true":
+            parsed = True
+        elif value == b"false":
+            parsed = False
+        elif value == b"null":
+            parsed = None
+        elif b"." in value or b"e" in value or b"E" in value:
+            parsed = float(value)
+        else:
+            parsed = int(value)
+        self._record[self._capture] = parsed
+        self._capture = None
+
+
+def extract(stream, keys: list[str], depth: int = 1, chunk_size: int = 256):
+    """
+    Read a JSON document from a stream and yield the requested keys of each item.
+
+    Args:
+        stream: A readable stream supporting `readinto`, e.g. a socket.
+        keys (list[str]): The keys to extract from each item.
+        depth (int, optional): The nesting depth of the item objects. Defaults to 1.
+        chunk_size (int, optional): The size of the read buffer in bytes. Defaults to 256.
+
+    Yields:
+        dict: The extracted keys of each item. Keys missing from an item are absent.
+
+    Raises:
+        BadResponse: If the document is not valid JSON.
+    """
+    parser = JSONExtractor(keys, depth=depth)
+    buf = bytearray(chunk_size)
+    buf_mv = memoryview(buf)
+    while True:
+        n = stream.readinto(buf)
+        if not n:
+            break
+        parser.feed(buf_mv[:n])
+        while parser.records:
+            yield parser.records.pop(0)
@@ -2,13 +2,61 @@ from writer import Writer
 from waveshare_pico_oled_1p3inch import PICO_OLED_1P3INCH
 import font
 from wlan import WiFi
-from synctime import sync_time, localtime
+from synctime import clock, localtime
 from tflwrapper import TFLWrapper
 from weather import OpenWeatherWrapper
+from httpclient import HTTPClient
+from arrivals import Arrivals, ArrivalsCache
+from buttons import Button
+from scheduler import FetchTask
+from networker import get_worker
+from refresh import RefreshPolicy
+from ratelimit import RateLimiter, BACKGROUND
+from health import HealthMonitor
+from snapshot import Snapshot
+from supervisor import Supervisor
+from circuit import TRANSIENT_ERRORS
 from configs import TFL_APP_KEY, WIFI_SSID, WIFI_PASSWORD, WEATHER_API_KEY, WEATHER_LAT, WEATHER_LON
+try:
+    from configs import NETWORK_THREAD
+except ImportError:
+    NETWORK_THREAD = True
+try:
+    from configs import QUIET_HOURS
+except ImportError:
+    QUIET_HOURS = None
+try:
+    from configs import PREFETCH
+except ImportError:
+    PREFETCH = False
+try:
+    from configs import TFL_REQUESTS_PER_MINUTE
+except ImportError:
+    TFL_REQUESTS_PER_MINUTE = 50
+try:
+    from configs import WEATHER_REQUESTS_PER_MINUTE
+except ImportError:
+    WEATHER_REQUESTS_PER_MINUTE = 10
+
+# shared by every TFLDisplay so the budgets hold across restarts
+rate_limiter = RateLimiter({"api.tfl.gov.uk": TFL_REQUESTS_PER_MINUTE,
+                            "api.openweathermap.org": WEATHER_REQUESTS_PER_MINUTE})
+# status and latency of every API request, reported on the system info page
+api_health = HealthMonitor()
+# last good board data, kept on flash and shown at boot while the network comes up
+snapshot = Snapshot()
+snapshot.load()
 
 import time
 import gc
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# ages turned into tick offsets are clamped to this many seconds, well within
+# the half tick period (about 6.2 days) that time.ticks_add accepts
+_MAX_TICKS_AGE = 5 * 24 * 3600
 
 
 class TFLDisplay:
@@ -17,118 +65,264 @@ class TFLDisplay:
         self.writer = Writer(self.screen, font)
         Writer.set_textpos(self.screen, 0, 0)
         self.wifi = WiFi()
-        self.tfl = TFLWrapper(TFL_APP_KEY)
+        self.http = HTTPClient(limiter=rate_limiter, health=api_health)  # keep-alive connections shared by the API wrappers
+        self.tfl = TFLWrapper(TFL_APP_KEY, http=self.http)
         self.weather = OpenWeatherWrapper(
-            WEATHER_API_KEY, WEATHER_LAT, WEATHER_LON)
-        self.key_select = self.screen.key0
-        self.key_menu = self.screen.key1
+            WEATHER_API_KEY, WEATHER_LAT, WEATHER_LON, http=self.http)
+        self.key_select = Button(self.screen.key0)
+        self.key_menu = Button(self.screen.key1)
+        # run all network calls on core 1 if enabled
+        self.worker = get_worker() if NETWORK_THREAD else None
+        # restart a failed board in place after transient errors
+        self.supervisor = Supervisor("board")
 
     def initialise(self):
         self.screen.init_display()
         self.screen.clear()
-        self.writer.mytext("Initialising...", 0)
+        # show the last good data while the network comes up
+        self.snapshot_shown = self._show_snapshot()
+        if not self.snapshot_shown:
+            self.writer.mytext("Initialising...", 0)
         self.screen.show()
 
         # Connect to WiFi
         self.wifi_connected = self.wifi.connect(
             WIFI_SSID, WIFI_PASSWORD, timeout=30)
         if self.wifi_connected:
-            self.writer.mytext(f"{self.wifi.status[0]}", 1)
-            self.screen.show()
+            self._init_message(f"{self.wifi.status[0]}", 1)
         else:
-            self.writer.mytext("Timeout, exiting", 1)
-            self.screen.show()
+            self._init_message("Timeout, exiting", 1, error=True)
             return False
 
         # Sync time
-        sync_time(max_try=2)  # max_try=2 to avoid long wait
+        clock.sync(max_try=2)  # max_try=2 to avoid long wait, resynced in the background
         time_now = localtime() # use user wrapper to get the time with timezone offset
-        self.writer.mytext(
+        self._init_message(
             f"{time_now[0]}-{time_now[1]:02d}-{time_now[2]:02d} {time_now[3]:02d}:{time_now[4]:02d}", 2)
-        self.screen.show()
 
         # Test TFL API connection
-        tfl_connected = self.tfl.test_connection()
-        if tfl_connected:
-            self.writer.mytext("TFL API OK", 3)
-            self.screen.show()
+        tfl_connected = self._call(self.tfl.test_connection)
+        if tfl_connected is True:  # otherwise the HTTP status code
+            self._init_message("TFL API OK", 3)
         else:
-            self.writer.mytext(f"TFL API: {tfl_connected}", 3)
-            self.screen.show()
+            self._init_message(f"TFL API: {tfl_connected}", 3, error=True)
             return False
 
         # Test OpenWeather API connection
-        weather_connected = self.weather.test_connection()
-        if weather_connected:
-            self.writer.mytext("Weather API OK", 4)
-            self.screen.show()
+        weather_connected = self._call(self.weather.test_connection)
+        if weather_connected is True:
+            self._init_message("Weather API OK", 4)
         else:
-            self.writer.mytext(f"Weather API: {weather_connected}", 4)
-            self.screen.show()
+            self._init_message(f"Weather API: {weather_connected}", 4, error=True)
             return False
 
-        time.sleep(1)
+        if not self.snapshot_shown:
+            time.sleep(1)
         gc.collect()
         return True
 
-    def main(self):
-        menu = ["Line status",
-                "Wood Lane Westbound",
-                "Wood Lane Eastbound",
-                "White City Westbound",
-                "White City Eastbound",
-                "System info",
-                "Reboot"]
+    def _init_message(self, text: str, line: int, error: bool = False) -> None:
+        """Internal function to show the progress of the initialisation.
+
+        While the snapshot is on screen, progress is only printed. Errors replace the snapshot.
+
+        Args:
+            text (str): The message
+            line (int): line number to print on
+            error (bool, optional): Whether the initialisation failed. Defaults to False.
+        """
+        print(text)
+        if self.snapshot_shown and not error:
+            return
+        if self.snapshot_shown:
+            self.screen.clear()
+            self.snapshot_shown = False
+        self.writer.mytext(text, line)
+        self.screen.show()
+
+    def _snapshot_marker(self, saved: int) -> str:
+        """Internal function to describe how old a snapshot section is.
+
+        Args:
+            saved (int): Time of the section in seconds since the epoch
+
+        Returns:
+            str: its age, or the time it was saved if the clock is not set yet
+        """
+        age = snapshot.age(saved)
+        if age is not None:
+            return f"{age//60}m old"
+        saved = localtime(saved)
+        return f"at {saved[3]:02d}:{saved[4]:02d}"
+
+    def _show_snapshot(self) -> bool:
+        """Internal function to draw the most recent board saved in the snapshot.
+
+        Returns:
+            bool: True if there was a snapshot to draw
+        """
+        if snapshot.departures_time and snapshot.departures_time >= snapshot.status_time:
+            arrivals = Arrivals(self.tfl.strings)
+            for platform_number, time_to_station, destination in snapshot.departures:
+                arrivals.add(platform_number, time_to_station, destination)
+            age = snapshot.age(snapshot.departures_time)
+            if age is not None:  # count down to now, otherwise show the times as saved
+                # every countdown has run out long before the clamp
+                arrivals.fetched = time.ticks_add(time.ticks_ms(), -min(age, _MAX_TICKS_AGE) * 1000)
+            cache = ArrivalsCache()
+            cache.update(arrivals)
+            self.writer.mytext_both_side(
+                snapshot.title, self._snapshot_marker(snapshot.departures_time), 0)
+            self._print_departure_times(self.writer.get_num_lines() - 1, cache)
+            return True
+        if snapshot.status_time:
+            self.writer.mytext_both_side(
+                snapshot.weather, f'{snapshot.temperature:.0f}"C', 0)
+            for i in range(min(len(snapshot.statuses), self.writer.get_num_lines() - 2)):
+                self.writer.mytext_both_side(
+                    snapshot.statuses[i][0], snapshot.statuses[i][1], i+1)
+            self.writer.mytext(self._snapshot_marker(snapshot.status_time),
+                               self.writer.get_num_lines()-1)
+            return True
+        return False
+
+    def _call(self, func, *args, **kwargs):
+        """Internal function to run an API call outside the event loop, e.g. during initialisation.
+
+        Args:
+            func: The API call
+            *args, **kwargs: Arguments of the call
+
+        Returns:
+            The result of the call
+        """
+        if self.worker is not None:
+            return self.worker.run(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    async def _fetch(self, func, *args, **kwargs):
+        """Internal function to run an API call from a task.
+
+        By default (NETWORK_THREAD) the call runs on core 1 and the event loop keeps running.
+        With NETWORK_THREAD = False the call blocks the event loop while it runs: the clock
+        and redraws stop, and key presses are latched by the button IRQs but only handled
+        once it returns.
+
+        Args:
+            func: The API call
+            *args, **kwargs: Arguments of the call
+
+        Returns:
+            The result of the call
+        """
+        if self.worker is not None:
+            return await self.worker.call(func, *args, **kwargs)
+        await asyncio.sleep_ms(0)  # let the boards run before blocking
+        return func(*args, **kwargs)
+
+    async def run(self, supervisor: Supervisor):
+        """Run the main menu, with the Wi-Fi link watchdog and clock resync in the background.
+
+        Args:
+            supervisor (Supervisor): Restarts the main menu in place after transient errors
+        """
+        watchdog = asyncio.create_task(self.wifi.watchdog())  # reconnect in place if the AP drops us
+        resync = asyncio.create_task(clock.run(self._fetch))
+        try:
+            await supervisor.run(self.main)
+        finally:
+            watchdog.cancel()
+            resync.cancel()
+
+    async def main(self):
+        # menu title, board and board arguments of each choice
+        boards = [("Line status", self._line_status_board,
+                   {"lines": ["hammersmith-city", "circle", "central"], "line_titles": ["H&C", "Circle", "Central"]}),
+                  ("Wood Lane Westbound", self._departure_board,
+                   {"title": "Wood Lane Westbound", "lines": ["circle", "hammersmith-city"], "line_titles": ["Circle", "H&C"], "stationId": "940GZZLUWLA", "direction": "Westbound"}),
+                  ("Wood Lane Eastbound", self._departure_board,
+                   {"title": "Wood Lane Eastbound", "lines": ["circle", "hammersmith-city"], "line_titles": ["Circle", "H&C"], "stationId": "940GZZLUWLA", "direction": "Eastbound"}),
+                  ("White City Westbound", self._departure_board,
+                   {"title": "White City Westbound", "lines": ["central"], "line_titles": ["Central"], "stationId": "940GZZLUWCY", "direction": "Westbound"}),
+                  ("White City Eastbound", self._departure_board,
+                   {"title": "White City Eastbound", "lines": ["central"], "line_titles": ["Central"], "stationId": "940GZZLUWCY", "direction": "Eastbound"}),
+                  ("System info", self._system_info, {}),
+                  ("Reboot", None, {})]
+        menu = [board[0] for board in boards]
         choice = 0
+        prefetch_after = 1.  # Prefetch once the highlighted choice has been kept for 1 second
 
         self.screen.clear()
         self._show_main_menu(menu, choice)
 
         idle_time = 0.
+        prefetcher = None
 
         while True:
 
-            if self.key_select.value() == 0 or idle_time > 10.:
+            if self.key_select.pressed() or idle_time > 10.:
                 idle_time = 0.
-                if choice == 0:
-                    self._line_status_board(
-                        ["hammersmith-city", "circle", "central"], ["H&C", "Circle", "Central"])
-                elif choice == 1:
-                    self._departure_board(
-                        "Wood Lane Westbound", ["circle", "hammersmith-city"], ["Circle", "H&C"], "940GZZLUWLA", direction="Westbound")
-                elif choice == 2:
-                    self._departure_board(
-                        "Wood Lane Eastbound", ["circle", "hammersmith-city"], ["Circle", "H&C"], "940GZZLUWLA", direction="Eastbound")
-                elif choice == 3:
-                    self._departure_board(
-                        "White City Westbound", ["central"], ["Central"], "940GZZLUWCY", direction="Westbound")
-                elif choice == 4:
-                    self._departure_board(
-                        "White City Eastbound", ["central"], ["Central"], "940GZZLUWCY", direction="Eastbound")
-                elif choice == 5:
-                    self._system_info()
-                    pass
-                elif choice == 6:
+                if prefetcher is not None:
+                    prefetcher.cancel()
+                    prefetcher = None
+                board, kwargs = boards[choice][1], boards[choice][2]
+                if board is None:
+                    snapshot.flush(force=True)  # keep the latest data for the next boot
                     self.screen.clear()
                     self.writer.mytext("Reboot in 5s", 0)
                     self.screen.show()
                     return  # this go back to the power-on loop
-                else:
-                    print(f"Invalid choice = {choice}")
+                await self.supervisor.run(board, **kwargs)
 
                 gc.collect()
-                time.sleep(0.25)  # wait avoid double click
                 # show the main menu again
                 self._show_main_menu(menu, choice)
 
-            if self.key_menu.value() == 0:
+            if self.key_menu.pressed():
                 idle_time = 0.
+                if prefetcher is not None:
+                    prefetcher.cancel()
+                    prefetcher = None
                 choice = (choice+1) % len(menu)
 
                 self._show_main_menu(menu, choice, update=True)
 
+            if PREFETCH and self.worker is not None and prefetcher is None and idle_time > prefetch_after:
+                # warm the caches of the highlighted board and its neighbours; only with
+                # the worker, on the main core each request would stall the menu
+                prefetcher = asyncio.create_task(self._prefetch(
+                    [boards[choice][2], boards[(choice+1) % len(boards)][2], boards[choice-1][2]]))
+
             idle_time += 0.1
-            time.sleep(0.1)
+            await asyncio.sleep(0.1)
+
+    async def _prefetch(self, boards: list[dict]) -> None:
+        """Internal function to fetch the data boards start with, at background priority.
+
+        Departure boards use predictions prefetched within their minimum refresh interval,
+        and the line statuses and weather are cached by their wrappers, so the boards render
+        at once. Stops at the first request refused by the rate limiter or failing.
+
+        Args:
+            boards (list[dict]): Board arguments of the menu choices to prefetch
+        """
+        max_age = 15  # Keep predictions prefetched within the last 15 seconds
+
+        for kwargs in boards:
+            try:
+                # the priority goes with each request, the other tasks and core 1 keep theirs
+                if "stationId" in kwargs:  # departure board
+                    await self._fetch(self.tfl.arrival_predict, kwargs["lines"], kwargs["stationId"],
+                                      direction=kwargs.get("direction", "all"),
+                                      limit=self.writer.get_num_lines() + 1,  # as _departure_board
+                                      max_age=max_age, priority=BACKGROUND)
+                    await self._fetch(self.tfl.line_status, kwargs["lines"], priority=BACKGROUND)
+                elif "lines" in kwargs:  # line status board
+                    await self._fetch(self.tfl.line_status, kwargs["lines"], priority=BACKGROUND)
+                    await self._fetch(self.weather.get_weather, BACKGROUND)
+            except TRANSIENT_ERRORS as e:
+                print(f"Prefetch stopped: {e}")
+                return
 
     def _show_main_menu(self, menu, choice, update=False):
         if not update:
@@ -144,13 +338,14 @@ class TFLDisplay:
         self.writer.mytext(menu[(choice+2) % len(menu)], 4)
         self.screen.show()
 
-    def _line_status_board(self, lines: list[str], line_titles: list[str]):
-        auto_refresh = 600.  # Refresh every 10 minutes
+    async def _line_status_board(self, lines: list[str], line_titles: list[str], policy: RefreshPolicy | None = None):
+        if policy is None:
+            # Refresh every 10 minutes
+            policy = RefreshPolicy(min_interval=600., max_interval=600., quiet_hours=QUIET_HOURS)
 
         self.screen.clear()
-        self.writer.mytext_both_side("Loading...", f"{localtime()[3]:02d}:{
-                                     localtime()[4]:02d}", self.writer.get_num_lines()-1)
-        self.screen.show()
+        self.writer.mytext_both_side("Loading...", self._clock_text(), self.writer.get_num_lines()-1)
+        await self.screen.show_async(swap=True)
 
         # only display the first N lines fit to the screen
         num_lines = min(self.writer.get_num_lines()-2, len(lines))
@@ -162,49 +357,77 @@ class TFLDisplay:
         lines = lines[:num_lines]
         line_titles = line_titles[:num_lines]
 
-        while True:
-            line_status = self.tfl.line_status(lines, short=True)
-
-            self.screen.clear()
-            self.writer.mytext_both_side(self.weather.get_weather(), f'{
-                                         self.weather.get_temperature():.0f}"C', 0)
-            for i in range(num_lines):
-                self.writer.mytext_both_side(
-                    line_titles[i], line_status[i], i+1)
-            self.writer.mytext_both_side("", f"{localtime()[3]:02d}:{
-                                         localtime()[4]:02d}", self.writer.get_num_lines()-1)
-            last_minute = localtime()[4]
-            self.screen.show()
-
-            idle_time = 0.
-            for _ in range(int(auto_refresh/.1)):
-                if self.key_select.value() == 0:
-                    break  # refresh now
-                if self.key_menu.value() == 0:
+        stale_after = 60  # Flag statuses 60 seconds past their scheduled refresh
+        line_status = []
+        status_fetched = None  # time.ticks_ms() of the oldest status shown
+        weather = ""
+        temperature = 0.
+
+        async def fetch():
+            nonlocal line_status, status_fetched, weather, temperature
+            line_status = await self._fetch(self.tfl.line_status, lines, short=True)  # cached for TFLWrapper.status_ttl
+            # the last good statuses are served while the API is failing
+            age = await self._fetch(self.tfl.status_age, lines)
+            status_fetched = time.ticks_add(time.ticks_ms(), -min(age or 0, _MAX_TICKS_AGE) * 1000)
+            weather = await self._fetch(self.weather.get_weather)
+            temperature = await self._fetch(self.weather.get_temperature)
+            snapshot.update_status(line_titles, line_status, weather, temperature, age=age or 0)
+            snapshot.flush()
+
+        def stale_marker():
+            age = time.ticks_diff(time.ticks_ms(), status_fetched) // 1000
+            if age > policy.interval + stale_after:
+                return f"{age//60}m old"
+            return ""
+
+        fetcher = FetchTask(fetch, policy.next_interval)
+        try:
+            last_minute = None
+            shown_failures = 0
+            while True:
+                if self.key_select.pressed():
+                    # the cache belongs to the network side
+                    await self._fetch(self.tfl.invalidate_status, lines)
+                    fetcher.refresh()  # refresh now
+                    self.writer.clear_line(4)
+                    self.writer.mytext_both_side("Updating...", self._clock_text(), 4)
+                    last_minute = localtime()[4]
+                    await self.screen.show_async(swap=True)
+                if self.key_menu.pressed():
                     return  # go to the main screen
-                time.sleep(0.1)
-                idle_time += 0.1
-                if idle_time > 5.:  # update time every 5 seconds
-                    if last_minute != localtime()[4]:
-                        # update time only
+
+                if fetcher.poll():
+                    self.screen.clear()
+                    self.writer.mytext_both_side(weather, f'{temperature:.0f}"C', 0)
+                    for i in range(num_lines):
+                        self.writer.mytext_both_side(
+                            line_titles[i], line_status[i], i+1)
+                    self.writer.mytext_both_side(stale_marker(), self._clock_text(), self.writer.get_num_lines()-1)
+                    last_minute = localtime()[4]
+                    await self.screen.show_async(swap=True)
+                elif last_minute is None and fetcher.failures != shown_failures:
+                    # nothing to show yet, the fetch is retried with backoff
+                    shown_failures = fetcher.failures
+                    if shown_failures:
                         self.writer.clear_line(4)
-                        self.writer.mytext_both_side("", f"{localtime()[3]:02d}:{
-                            localtime()[4]:02d}", 4)
-                        last_minute = localtime()[4]
-                        self.screen.show()
-                    idle_time = 0.
-
-            # clear screen and refresh
-            self.writer.clear_line(4)
-            self.writer.mytext_both_side("Updating...", f"{localtime()[3]:02d}:{
-                                         localtime()[4]:02d}", 4)
-            last_minute = localtime()[4]
-            self.screen.show()
-
-    def _departure_board(self, title: str, lines: list[str], line_titles: list[str], stationId: str, direction="all") -> None:
+                        self.writer.mytext_both_side("Retrying...", self._clock_text(), 4)
+                        await self.screen.show_async(swap=True)
+                elif last_minute is not None and last_minute != localtime()[4]:
+                    # update time only
+                    self.writer.clear_line(4)
+                    self.writer.mytext_both_side(stale_marker(), self._clock_text(), 4)
+                    last_minute = localtime()[4]
+                    await self.screen.show_async(swap=True)
+
+                await asyncio.sleep(0.1)
+        finally:
+            fetcher.cancel()
+
+    async def _departure_board(self, title: str, lines: list[str], line_titles: list[str], stationId: str, direction="all", policy: RefreshPolicy | None = None) -> None:
         """Internal function to display departure board for a single station.
 
-        the screen will be updated every 2 * len(lines) seconds with every 2 seconds showing each line's status. 
+        Predictions are fetched when the refresh policy asks for it and counted down locally in between.
+        The title line shows each line's status in turn, every 2 seconds.
 
         Args:
             title (str): Title of the screen
@@ -212,88 +435,200 @@ class TFLDisplay:
             line_titles (list[str]): List of line titles
             stationId (str): Station ID
             direction (str, optional): First word of the platform names, e.g. Westbound. Defaults to "all".
+            policy (RefreshPolicy, optional): When to fetch new predictions. Defaults to None
+                (between 15 seconds and 5 minutes depending on the next train).
         """
-        auto_refresh = 2.  # Refresh every 2 * len(lines) seconds
+        header_interval = 2.  # Show each line's status for 2 seconds
+        stale_after = 60  # Flag predictions 60 seconds past their scheduled refresh
+
+        if policy is None:
+            policy = RefreshPolicy(quiet_hours=QUIET_HOURS)
 
         self.screen.clear()
         self.writer.mytext(title, 0)
-        self.screen.show()
+        await self.screen.show_async(swap=True)
 
         if len(lines) != len(line_titles):
             print("Error: line and line title sizes mismatch")
             return  # back to the main menu
 
         num_departures = self.writer.get_num_lines() - 1
-
-        while True:
-            platform_number, time_to_station, dest = self.tfl.arrival_predict(
-                lines, stationId, direction=direction)
-
-            line_status = self.tfl.line_status(lines, short=True)
-
-            self.screen.clear()
-            self.writer.mytext(title, 0)
-
-            # if all platforms are the same, only display time
-            same_platform = all(
-                x == platform_number[0] for x in platform_number)
-
-            for i in range(min(num_departures, len(platform_number))):
-                if same_platform:
-                    self.writer.mytext_both_side(
-                        dest[i], f"{time_to_station[i]//60}", i+1)
-                else:
-                    self.writer.mytext_both_side(dest[i], f"Pl.{platform_number[i]} {
-                        time_to_station[i]//60}", i+1)
-            self.screen.show()
-
-            idle_time = 0.
-            line_status_to_display = 0
-            while line_status_to_display <= len(lines):
-                if self.key_select.value() == 0:
-                    break  # refresh now
-                if self.key_menu.value() == 0:
+        arrivals = ArrivalsCache()
+        line_status = []
+
+        max_age = policy.min_interval  # the first fetch may use predictions prefetched from the menu
+
+        async def fetch():
+            nonlocal line_status, max_age
+            # keep a couple of spare rows for trains departing before the next fetch
+            arrivals.update(await self._fetch(
+                self.tfl.arrival_predict, lines, stationId, direction=direction, limit=num_departures + 2, max_age=max_age))
+            max_age = None
+            try:
+                line_status = await self._fetch(self.tfl.line_status, lines, short=True)
+            except TRANSIENT_ERRORS:
+                if not line_status:
+                    line_status = ["Unknown"] * len(lines)  # still show the predictions
+            snapshot.update_departures(title, list(zip(*arrivals.arrivals.lists())), age=arrivals.age())
+            snapshot.flush()
+
+        fetcher = FetchTask(
+            fetch, lambda: policy.next_interval(arrivals.arrivals.times))
+        try:
+            displayed = None
+            shown_failures = 0
+            while True:
+                if self.key_select.pressed():
+                    fetcher.refresh()  # refresh now
+                    # change the title to "updating"
+                    self.writer.clear_line(0)
+                    self.writer.mytext("Updating...", 0)
+                    await self.screen.show_async(swap=True)
+                if self.key_menu.pressed():
                     return  # go to the main screen
 
-                if idle_time > auto_refresh:
-                    if line_status_to_display == len(lines):
-                        break  # all line status displayed, time to refresh
+                if fetcher.poll():
+                    self.screen.clear()
+                    self.writer.mytext(title, 0)
+                    displayed = self._print_departure_times(
+                        num_departures, arrivals)
+                    await self.screen.show_async(swap=True)
+                    header_time = 0.
+                    countdown_time = 0.
+                    header = 0  # 0 shows the title, i shows the status of lines[i-1]
+                elif displayed is None and fetcher.failures != shown_failures:
+                    # nothing to show yet, the fetch is retried with backoff
+                    shown_failures = fetcher.failures
+                    if shown_failures:
+                        self.writer.clear_line(1)
+                        self.writer.mytext("Retrying...", 1)
+                        await self.screen.show_async(swap=True)
+
+                await asyncio.sleep(0.1)
+                if displayed is None:
+                    continue  # nothing fetched yet
+                header_time += 0.1
+                countdown_time += 0.1
+
+                if header_time > header_interval:
+                    header = (header + 1) % (len(lines) + 1)
+                    header_time = 0.
                     self.writer.clear_line(0)
-                    self.writer.mytext_both_side(
-                        line_titles[line_status_to_display], line_status[line_status_to_display], 0)
-                    self.screen.show()
-                    line_status_to_display += 1
-                    idle_time = 0.
-                else:
-                    idle_time += 0.1
-                    time.sleep(0.1)
+                    if header == 0:
+                        age = arrivals.age()
+                        if age > policy.interval + stale_after:
+                            self.writer.mytext_both_side(
+                                title, f"{age//60}m old", 0)
+                        else:
+                            self.writer.mytext(title, 0)
+                    else:
+                        self.writer.mytext_both_side(
+                            line_titles[header-1], line_status[header-1], 0)
+                    await self.screen.show_async(swap=True)
+
+                # count down locally, only redraw when the minutes change
+                if countdown_time >= 1.:
+                    countdown_time = 0.
+                    if self._departure_rows(num_departures, arrivals) != displayed:
+                        for i in range(1, num_departures + 1):
+                            self.writer.clear_line(i)
+                        displayed = self._print_departure_times(
+                            num_departures, arrivals)
+                        await self.screen.show_async(swap=True)
+        finally:
+            fetcher.cancel()
+
+    def _clock_text(self) -> str:
+        """Internal function to format the local time for the boards.
+
+        Returns:
+            str: HH:MM
+        """
+        now = localtime()  # cached for the current second
+        return f"{now[3]:02d}:{now[4]:02d}"
 
-            # change the title to "updating"
-            self.writer.clear_line(0)
-            self.writer.mytext("Updating...", 0)
-            self.screen.show()
-
-    def _print_departure_times(self, lines: int, platform_number: list[str], time_to_station: list[int], destinations: list[str]) -> None:
-        """Internal function to print departure times on the screen.
+    def _departure_rows(self, lines: int, arrivals: ArrivalsCache) -> list[tuple[str, str]]:
+        """Internal function to format departure times as rows of text.
 
         Args:
             lines (int): max number of lines to display
-            platform_number (list[str]): list of platform numbers
-            time_to_station (list[int]): list of time to station in seconds
-            destinations (list[str]): list of destinations
+            arrivals (ArrivalsCache): cached predictions, counted down to now
+
+        Returns:
+            list[tuple[str, str]]: left and right side text of each row
         """
         # if all platforms are the same, only display time
-        same_platform = all(
-            x == platform_number[0] for x in platform_number)
-        for i in range(min(lines, len(platform_number))):
+        same_platform = arrivals.same_platform()
+        rows = []
+        for platform_number, time_to_station, destination in arrivals.upcoming():
+            if len(rows) >= lines:
+                break
             if same_platform:
-                self.writer.mytext_both_side(
-                    destinations[i], f"{time_to_station[i]//60}", i+1)
+                rows.append((destination, f"{time_to_station//60}"))
             else:
-                self.writer.mytext_both_side(destinations[i], f"Pl.{platform_number[i]} {
-                    time_to_station[i]//60}", i+1)
+                rows.append((destination, f"Pl.{platform_number} {time_to_station//60}"))
+        return rows
+
+    def _print_departure_times(self, lines: int, arrivals: ArrivalsCache) -> list[tuple[str, str]]:
+        """Internal function to print departure times on the screen.
+
+        Args:
+            lines (int): max number of lines to display
+            arrivals (ArrivalsCache): cached predictions, counted down to now
+
+        Returns:
+            list[tuple[str, str]]: the rows printed, see _departure_rows
+        """
+        rows = self._departure_rows(lines, arrivals)
+        for i in range(len(rows)):
+            self.writer.mytext_both_side(rows[i][0], rows[i][1], i+1)
+        return rows
+
+    def _request_count(self, host: str) -> str:
+        """Internal function to format the request counters of an API host.
+
+        Args:
+            host (str): The API host name
+
+        Returns:
+            str: requests sent, and requests refused by the rate limiter if any
+        """
+        requests = rate_limiter.requests.get(host, 0)
+        throttled = rate_limiter.throttled.get(host, 0)
+        if throttled:
+            return f"{requests}r {throttled}lim"
+        return f"{requests}r"
+
+    async def _api_health(self, name: str, host: str, probe, line: int) -> None:
+        """Internal function to show the health of an API host from its recent requests.
+
+        The API is only probed if it has not been used for `probe_after` seconds.
 
-    def _system_info(self):
+        Args:
+            name (str): Short name of the API
+            host (str): The API host name
+            probe: Function sending a request to the API, e.g. its test_connection
+            line (int): line number to print on
+        """
+        probe_after = 60
+
+        health = api_health.get(host)
+        if health is None or health.idle() > probe_after:
+            try:
+                await self._fetch(probe)  # the outcome is recorded by the HTTP client
+            except TRANSIENT_ERRORS as e:
+                print(f"{name} probe failed: {e}")
+            health = api_health.get(host)
+
+        if health is None:
+            self.writer.mytext(f"{name} ? {self._request_count(host)}", line)
+            return
+        state = "OK" if health.ok else health.status_code or "err"
+        rtt = "-" if health.rtt_ms is None else f"{health.rtt_ms}ms"
+        self.writer.mytext_both_side(
+            f"{name} {state} {self._request_count(host)}", f"{rtt} {health.success_rate()}%", line)
+
+    async def _system_info(self):
         while True:
             self.screen.clear()
 
@@ -301,42 +636,36 @@ class TFLDisplay:
             self.writer.mytext(f"mac:{mac}", 0)
             self.writer.mytext(f"{self.wifi.status[0]}", 1)
 
-            tfl_connected = self.tfl.test_connection()
-            if tfl_connected:
-                self.writer.mytext("TFL API OK", 2)
-            else:
-                self.writer.mytext(f"TFL API: {tfl_connected}", 2)
-
-            weather_connected = self.weather.test_connection()
-            if weather_connected:
-                self.writer.mytext("Weather API OK", 3)
-            else:
-                self.writer.mytext(f"Weather API: {weather_connected}", 3)
+            await self._api_health("TFL", "api.tfl.gov.uk", self.tfl.test_connection, 2)
+            await self._api_health("Wthr", "api.openweathermap.org", self.weather.test_connection, 3)
 
             time_now = localtime()
             self.writer.mytext(
                 f"{time_now[0]}-{time_now[1]:02d}-{time_now[2]:02d} {time_now[3]:02d}:{time_now[4]:02d}", 4)
-            self.screen.show()
+            await self.screen.show_async(swap=True)
 
             for _ in range(10000//100):
-                if self.key_select.value() == 0:
+                if self.key_select.pressed():
                     break
-                if self.key_menu.value() == 0:
+                if self.key_menu.pressed():
                     return
-                time.sleep(0.1)
+                await asyncio.sleep(0.1)
 
 
 # the main loop
+# errors raised from the main menu restart it in place while transient, otherwise cold
+supervisor = Supervisor("main menu")
 while True:
     try:
         app = TFLDisplay()
         if app.initialise():
-            app.main()
+            asyncio.run(app.run(supervisor))
             print("Exit from the main menu")
         else:
             print("Initialisation failed")
     except Exception as e:
         print(f"Exception: {e}")
+    asyncio.new_event_loop()  # drop any tasks left over from the last run
 
     print("Restart in 5 seconds")
     gc.collect()
@@ -0,0 +1,166 @@
+"""Run network calls on the second core of the RP2040.
+
+The NetworkWorker runs API calls (HTTP fetching and parsing) on core 1 and
+hands the results back to core 0 through a lock-protected mailbox, so
+rendering and button handling on core 0 never wait on the network.
+
+Only one worker can exist because core 1 can only run one thread; use
+`get_worker()` to create or reuse it.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import _thread
+import time
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class NetworkWorker:
+    poll_ms = 10  # how often each side checks the mailbox
+
+    def __init__(self) -> None:
+        """
+        Start the worker thread on core 1.
+        """
+        self._lock = _thread.allocate_lock()
+        self._jobs = []  # (job_id, func, args, kwargs) waiting for core 1
+        self._results = {}  # job_id -> (ok, value) waiting for core 0
+        self._abandoned = set()  # job_ids whose caller gave up waiting
+        self._next_id = 0
+        _thread.start_new_thread(self._run, ())
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                job = self._jobs.pop(0) if self._jobs else None
+            if job is None:
+                time.sleep_ms(self.poll_ms)
+                continue
+
+            job_id, func, args, kwargs = job
+            try:
+                result = (True, func(*args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+            with self._lock:
+                if job_id in self._abandoned:
+                    self._abandoned.remove(job_id)
+                else:
+                    self._results[job_id] = result
+
+    def submit(self, func, *args, **kwargs) -> int:
+        """
+        Queue a call to run on core 1.
+
+        Args:
+            func: The function to call
+            *args, **kwargs: Arguments of the call
+
+        Returns:
+            int: The job ID, to be passed to `result()`.
+        """
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs.append((job_id, func, args, kwargs))
+        return job_id
+
+    def result(self, job_id: int) -> tuple[bool, object]:
+        """
+        Collect the result of a job if it has finished.
+
+        Args:
+            job_id (int): The job ID returned by `submit()`.
+
+        Returns:
+            tuple: (done, value). value is the return value of the call once done.
+
+        Raises:
+            Exception: The exception raised by the call.
+        """
+        with self._lock:
+            if job_id not in self._results:
+                return False, None
+            ok, value = self._results.pop(job_id)
+        if not ok:
+            raise value
+        return True, value
+
+    def discard(self, job_id: int) -> None:
+        """
+        Drop the result of a job, now or when it finishes.
+
+        Args:
+            job_id (int): The job ID returned by `submit()`.
+        """
+        with self._lock:
+            if job_id in self._results:
+                del self._results[job_id]
+            elif any(job[0] == job_id for job in self._jobs):
+                self._jobs = [job for job in self._jobs if job[0] != job_id]
+            else:
+                self._abandoned.add(job_id)
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Run a call on core 1 and wait for its result without blocking the event loop.
+
+        Args:
+            func: The function to call
+            *args, **kwargs: Arguments of the call
+
+        Returns:
+            The return value of the call.
+        """
+        job_id = self.submit(func, *args, **kwargs)
+        done = False
+        try:
+            while True:
+                done, value = self.result(job_id)
+                if done:
+                    return value
+                await asyncio.sleep_ms(self.poll_ms)
+        except Exception:
+            done = True  # the call raised, its result is already collected
+            raise
+        finally:
+            if not done:
+                self.discard(job_id)  # cancelled while the call was running
+
+    def run(self, func, *args, **kwargs):
+        """
+        Run a call on core 1 and block until it finishes.
+
+        Args:
+            func: The function to call
+            *args, **kwargs: Arguments of the call
+
+        Returns:
+            The return value of the call.
+        """
+        job_id = self.submit(func, *args, **kwargs)
+        while True:
+            done, value = self.result(job_id)
+            if done:
+                return value
+            time.sleep_ms(self.poll_ms)
+
+
+_worker = None
+
+
+def get_worker() -> NetworkWorker:
+    """
+    Get the network worker, starting it on the first call.
+
+    Returns:
+        NetworkWorker: The worker running on core 1.
+    """
+    global _worker
+    if _worker is None:
+        _worker = NetworkWorker()
+    return _worker
@@ -0,0 +1,121 @@
+"""Token-bucket rate limiting and request accounting for the API hosts.
+
+Every request made through the HTTPClient takes a token from the bucket of
+its host. Requests never wait for a token: a request that finds the bucket
+empty is refused with RateLimited at once, so the event loop is never
+blocked, and its FetchTask retries it with backoff. Background requests
+(prefetching) are also refused unless the bucket is well stocked, so they
+never starve the board the user is looking at.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+
+FOREGROUND = 0
+BACKGROUND = 1
+
+
+class RateLimited(Exception):
+    """Raised when a request is refused because its host's budget is spent."""
+
+    def __init__(self, host: str, retry_ms: int) -> None:
+        """
+        Initialize a RateLimited error.
+
+        Args:
+            host (str): The host name.
+            retry_ms (int): Milliseconds until the host's next token.
+        """
+        super().__init__(f"{host} budget spent, retry in {retry_ms}ms")
+        self.retry_ms = retry_ms
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float) -> None:
+        """
+        Initialize a full TokenBucket.
+
+        Args:
+            per_minute (float): The budget, in requests per minute. It is also the burst size.
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60000  # tokens per millisecond
+        self.tokens = per_minute
+        self._last = time.ticks_ms()
+
+    def _refill(self) -> None:
+        now = time.ticks_ms()
+        self.tokens = min(self.capacity, self.tokens +
+                          time.ticks_diff(now, self._last) * self.rate)
+        self._last = now
+
+    def take(self, reserve: float = 0.) -> bool:
+        """
+        Take a token if more than `reserve` tokens are left.
+
+        Args:
+            reserve (float, optional): Tokens that must be left after taking one. Defaults to 0.
+
+        Returns:
+            bool: True if a token was taken.
+        """
+        self._refill()
+        if self.tokens - 1 >= reserve:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_ms(self, reserve: float = 0.) -> int:
+        """
+        Get the time until the next token is available.
+
+        Args:
+            reserve (float, optional): Tokens that must be left after taking one. Defaults to 0.
+
+        Returns:
+            int: Milliseconds until a token can be taken.
+        """
+        self._refill()
+        if self.tokens - 1 >= reserve:
+            return 0
+        return int((1 + reserve - self.tokens) / self.rate) + 1
+
+
+class RateLimiter:
+    background_reserve = 0.5  # fraction of each bucket kept for foreground requests
+
+    def __init__(self, budgets: dict) -> None:
+        """
+        Initialize a RateLimiter.
+
+        Args:
+            budgets (dict): Requests per minute allowed for each host, e.g. {"api.tfl.gov.uk": 50}.
+                Hosts not listed are not limited but are still counted.
+        """
+        self._buckets = {}
+        for host in budgets:
+            self._buckets[host] = TokenBucket(budgets[host])
+        self.requests = {}  # host -> requests sent
+        self.throttled = {}  # host -> requests refused
+
+    def acquire(self, host: str, priority: int = FOREGROUND) -> None:
+        """
+        Take a token for a request to `host` without waiting.
+
+        Args:
+            host (str): The host name.
+            priority (int, optional): FOREGROUND, or BACKGROUND to leave `background_reserve` of the
+                bucket to foreground requests. Defaults to FOREGROUND.
+
+        Raises:
+            RateLimited: If no token is available.
+        """
+        bucket = self._buckets.get(host)
+        if bucket is not None:
+            reserve = bucket.capacity * self.background_reserve if priority == BACKGROUND else 0.
+            if not bucket.take(reserve):
+                self.throttled[host] = self.throttled.get(host, 0) + 1
+                raise RateLimited(host, bucket.wait_ms(reserve))
+        self.requests[host] = self.requests.get(host, 0) + 1
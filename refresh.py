@@ -0,0 +1,93 @@
+"""Adaptive refresh scheduling for the display boards.
+
+A RefreshPolicy decides how long a board waits before its next fetch. It
+polls sooner when a train is due or recent predictions have been moving
+around, backs off when nothing is due, and stops polling during quiet hours.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import time
+from synctime import localtime
+
+
+class RefreshPolicy:
+    backoff_factor = 2.  # multiply the interval by this while nothing is due
+    volatility_smoothing = 0.3  # weight of the latest prediction error in the volatility average
+    volatility_scale = 60.  # seconds of prediction error that halve the interval
+
+    def __init__(self, min_interval: float = 15., max_interval: float = 300., quiet_hours: tuple[int, int] | None = None) -> None:
+        """
+        Initialize a RefreshPolicy.
+
+        Args:
+            min_interval (float, optional): The shortest time between fetches in seconds. Defaults to 15.
+            max_interval (float, optional): The longest time between fetches in seconds. Defaults to 300.
+            quiet_hours (tuple[int, int], optional): Local (start, end) hours without fetches, e.g. (1, 5).
+                The window may wrap midnight. Defaults to None (no quiet hours).
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.quiet_hours = quiet_hours
+        self.interval = min_interval  # the last interval returned
+        self.volatility = 0.  # smoothed error of the soonest prediction, in seconds
+        self._last_soonest = None
+        self._last_fetch = None
+
+    def _quiet_remaining(self) -> int:
+        """Seconds until the end of the quiet hours, 0 outside them."""
+        if self.quiet_hours is None:
+            return 0
+        start, end = self.quiet_hours
+        now = localtime()
+        hour = now[3]
+        if start <= end:
+            quiet = start <= hour < end
+        else:
+            quiet = hour >= start or hour < end
+        if not quiet:
+            return 0
+        hours = (end - hour) % 24
+        return hours * 3600 - now[4] * 60 - now[5]
+
+    def next_interval(self, times=None) -> float:
+        """
+        Get the time to wait before the next fetch, after a fetch has completed.
+
+        Args:
+            times (optional): The time to station in seconds of the fetched predictions, soonest first.
+                Defaults to None, for boards without predictions, which refresh every `min_interval`.
+
+        Returns:
+            float: Seconds until the next fetch.
+        """
+        quiet = self._quiet_remaining()
+        if quiet > 0:
+            self.interval = quiet
+            return self.interval
+
+        if times is None:
+            self.interval = self.min_interval
+            return self.interval
+
+        now = time.ticks_ms()
+        if len(times) == 0:
+            # nothing is due, back off
+            self._last_soonest = None
+            self.interval = min(max(self.interval * self.backoff_factor, self.min_interval), self.max_interval)
+            return self.interval
+
+        soonest = times[0]
+        if self._last_soonest is not None:
+            expected = self._last_soonest - time.ticks_diff(now, self._last_fetch) // 1000
+            if expected >= 0:  # the same train should still be the soonest
+                error = abs(soonest - expected)
+                self.volatility += self.volatility_smoothing * (error - self.volatility)
+        self._last_soonest = soonest
+        self._last_fetch = now
+
+        # poll at half the time to the next train, sooner if predictions keep changing
+        interval = soonest / 2 / (1 + self.volatility / self.volatility_scale)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval
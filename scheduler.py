@@ -0,0 +1,99 @@
+"""Periodic fetch tasks for the asyncio based display app.
+
+A FetchTask runs a fetch coroutine in the background at a fixed interval, so
+boards can keep handling buttons and the clock and redraw when new data
+arrives instead of blocking on the network. Transient errors (network, bad
+responses, open circuits) are retried with exponential backoff, and requests
+refused by the rate limiter no sooner than its next token; other errors stop
+the task and are raised to the board.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+from circuit import TRANSIENT_ERRORS
+from ratelimit import RateLimited
+
+
+class FetchTask:
+    retry_interval = 5  # seconds before retrying a failed fetch, doubled with each failure
+    max_retry_interval = 300
+
+    def __init__(self, fetch, interval: float) -> None:
+        """
+        Start running `fetch` as an asyncio task.
+
+        Args:
+            fetch: A coroutine function fetching and storing new data.
+            interval (float or callable): Seconds to wait between the end of a fetch and the next one,
+                or a function called after each fetch returning them.
+        """
+        self.fetch = fetch
+        self.interval = interval
+        self.error = None
+        self.failures = 0  # consecutive failed fetches
+        self.last_error = None  # error of the last failed fetch, None after a success
+        self._updated = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.fetch()
+            except TRANSIENT_ERRORS as e:
+                self.failures += 1
+                self.last_error = e
+                print(f"Fetch failed: {e}")
+                backoff = min(self.retry_interval * 2 ** (self.failures - 1),
+                              self.max_retry_interval)
+                if isinstance(e, RateLimited):
+                    backoff = max(e.retry_ms / 1000, backoff)  # no token before then
+                await self._wait(backoff)
+                continue
+            except Exception as e:
+                self.error = e  # raised to the board by poll()
+                return
+            self.failures = 0
+            self.last_error = None
+            self._updated = True
+            await self._wait(self.interval() if callable(self.interval) else self.interval)
+
+    async def _wait(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def refresh(self) -> None:
+        """
+        Start the next fetch now instead of waiting for the interval.
+        """
+        self._wake.set()
+
+    def poll(self) -> bool:
+        """
+        Check whether new data has arrived since the last call.
+
+        Returns:
+            bool: True if a fetch completed since the last call.
+
+        Raises:
+            Exception: The exception that stopped the fetch task, if any.
+        """
+        if self.error is not None:
+            raise self.error
+        updated = self._updated
+        self._updated = False
+        return updated
+
+    def cancel(self) -> None:
+        """
+        Stop the fetch task.
+        """
+        self._task.cancel()
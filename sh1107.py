@@ -79,7 +79,12 @@ __repo__ = "https://github.com/peter-l5/SH1107"
 
 ## SH1107 module code
 from micropython import const
+import micropython
 import time
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 # import extended framebuffer if available)
 try:
     import framebuf2 as framebuf
@@ -119,7 +124,20 @@ _SET_VCOM_DSEL_LEVEL     = const(0xDB35) # 16. This command is to set the common
 _SET_DISPLAY_START_LINE  = const(0xDC00) # 17. Set Display Start Line (double byte command)
 
 
+@micropython.native
+def _diff_span(buf, shadow, start: int, end: int):
+    # narrow buf[start:end] to the span that differs from shadow, start == end if none
+    while start < end and buf[start] == shadow[start]:
+        start += 1
+    while end > start and buf[end - 1] == shadow[end - 1]:
+        end -= 1
+    return start, end
+
+
 class SH1107(framebuf.FrameBuffer):
+    # compare the frame with what was last sent and only transmit the bytes that changed,
+    # set to False to send every dirty page in full
+    diff_updates = True
 
     def __init__(self, width, height, external_vcc, delay_ms=200, rotate=0):
         self.width = width
@@ -137,7 +155,22 @@ class SH1107(framebuf.FrameBuffer):
         self.bufsize = self.pages * self.width
         self.displaybuf = bytearray(self.bufsize)
         self.displaybuf_mv = memoryview(self.displaybuf)
+        # the frame as last sent to each half of the display RAM, the second half
+        # is only used by show(swap=True) and allocated on the first swap
+        self.shadows = [bytearray(self.bufsize), None]
+        self._shadow_valid = [False, False]
+        # 128 lines of display RAM hold a hidden frame behind the shown one
+        self.can_swap = not self.rotate90 and self.height * 2 <= 128
+        self._front = 0  # the half of the display RAM on screen
+        self._last_half = 0  # the half written by the last show, -1 if unknown
+        self._frame = 0  # number of the last frame requested by show or show_async
+        self.lock = asyncio.Lock()  # held by show_async while it sends a frame
+        self._sendbuf = None  # copy of the frame being sent by show_async
         self.pages_to_update = 0
+        # first and last changed byte of the rows (column of the page in rotate90 mode) of each dirty page
+        self.dirty_x0 = bytearray(self.pages)
+        self.dirty_x1 = bytearray(self.pages)
+        self._address = bytearray(3)  # page and column address command, reused by every show
         self._is_awake = False
         if self.rotate90:
             super().__init__(self.displaybuf, self.width, self.height,
@@ -150,6 +183,8 @@ class SH1107(framebuf.FrameBuffer):
     def init_display(self):
         multiplex_ratio = 0x7F if (self.height == 128)  else 0x3F
         self.reset()
+        self._shadow_valid = [False, False]  # display RAM content is unknown after a reset
+        (self._front, self._last_half) = (0, 0)  # and the start line is 0 again
         self.poweroff()
         self.fill(0)
         self.write_command((_SET_MULTIPLEX_RATIO | multiplex_ratio).to_bytes(2,"big"))
@@ -222,76 +257,182 @@ class SH1107(framebuf.FrameBuffer):
         self.write_command((_SET_NORMAL_INVERSE | (invert & 1)).to_bytes(1,"big"))
         self.inverse = invert
 
-    def show(self, full_update: bool = False):
+    def show(self, full_update: bool = False, swap: bool = False):
+        # with swap=True (and can_swap) the frame is written to the hidden half of the
+        # display RAM and then shown at once with display_start_line, so it never
+        # appears half sent; otherwise it is written to the half on screen.
+        # show() does not wait for lock: it preempts a show_async frame that is waiting
+        # or being sent, which is then dropped at its next page, and the next show
+        # compares the whole frame so nothing of either is lost
 #         _start = time.ticks_us()
-        (w, p, db_mv) = (self.width, self.pages, self.displaybuf_mv)
+        self._frame += 1  # supersedes any show_async frame
+        for _ in self._send(self.displaybuf, full_update, swap, False):
+            pass
+#         print("screen update used ", (time.ticks_us() - _start) / 1000, "ms")
+
+    def show_async(self, full_update: bool = False, swap: bool = False):
+        # awaitable show() that lets other tasks run between pages; the frame is copied
+        # when its transfer starts, so the next one can be drawn while it is sent.
+        # transfers are serialised by lock, and a frame still waiting or being sent
+        # when a later show starts is dropped. Pages are sent while other tasks may
+        # block, so use swap=True for frames that must not be seen half sent
+        self._frame += 1
+        return self._show_async(self._frame, full_update, swap)
+
+    async def _show_async(self, frame, full_update, swap):
+        async with self.lock:
+            if frame != self._frame:
+                return  # superseded by a later show
+            if self._sendbuf is None:
+                self._sendbuf = bytearray(self.bufsize)
+            self._sendbuf[:] = self.displaybuf
+            sending = self._send(self._sendbuf, full_update, swap, True)
+            for _ in sending:
+                await asyncio.sleep_ms(0)
+                if frame != self._frame:
+                    sending.close()
+                    return  # superseded, the later show compares the whole frame
+
+    def _send(self, db, full_update, swap, step):
+        # generator sending the frame in db, with step=True it yields after each page
+        # with the display deselected, so other writes can go in between
+        (w, p, db_mv) = (self.width, self.pages, memoryview(db))
+        frame = self._frame
+        half = self._front ^ 1 if swap and self.can_swap else self._front
+        if self.shadows[half] is None:
+            self.shadows[half] = bytearray(self.bufsize)
+        shadow = self.shadows[half]
+        shadow_mv = memoryview(shadow)
+        base = half * self.height  # first column of the half in non-rotate90 mode
+        (dirty_x0, dirty_x1) = (self.dirty_x0, self.dirty_x1)
+        if step:
+            # drawing can go on while the frame is sent
+            (dirty_x0, dirty_x1) = (bytes(dirty_x0), bytes(dirty_x1))
         current_page = 1
-        if full_update:
+        full_update = full_update or not self._shadow_valid[half]
+        # the dirty pages and spans are changes since the last show, so they only
+        # cover the changes to this half if the last show wrote it too
+        whole = full_update or half != self._last_half
+        if whole:
             pages_to_update = (1 << p) - 1
         else:
             pages_to_update = self.pages_to_update
-        if self.rotate90:
-            buffer_3Bytes = bytearray(3)
-            buffer_3Bytes[1] = _LOW_COLUMN_ADDRESS
-            buffer_3Bytes[2] = _HIGH_COLUMN_ADDRESS
-            for page in range(p):
-                if pages_to_update & current_page:
-                    buffer_3Bytes[0] = _SET_PAGE_ADDRESS | page
-                    self.write_command(buffer_3Bytes)
-                    page_start = w * page
-                    self.write_data(db_mv[page_start : page_start + w])
-                current_page <<= 1
-        else:
-            row_bytes = w // 8
-            buffer_2Bytes = bytearray(2)
-            for start_row in range(0, p * 8, 8):
-                if pages_to_update & current_page:
-                    for row in range(start_row, start_row + 8):
-                        buffer_2Bytes[0] = row & 0x0f  # low column (low col. cmd is 0x00)
-                        buffer_2Bytes[1] = _HIGH_COLUMN_ADDRESS | (row >> 4) 
-                        self.write_command(buffer_2Bytes)
-                        slice_start = row * row_bytes
-                        self.write_data(db_mv[slice_start : slice_start + row_bytes])
-                current_page <<= 1
         self.pages_to_update = 0
-#         print("screen update used ", (time.ticks_us() - _start) / 1000, "ms")
+        self._last_half = -1  # until this frame is sent in full
+        diff = self.diff_updates and not full_update
+        buffer_3Bytes = self._address
+        self._begin_transfer()
+        try:
+            if self.rotate90:
+                for page in range(p):
+                    if pages_to_update & current_page:
+                        page_start = w * page
+                        if whole:
+                            (start, end) = (page_start, page_start + w)
+                        else:
+                            (start, end) = (page_start + dirty_x0[page], page_start + dirty_x1[page] + 1)
+                        if diff:
+                            (start, end) = _diff_span(db, shadow, start, end)
+                        if start < end:
+                            column = start - page_start
+                            buffer_3Bytes[0] = _SET_PAGE_ADDRESS | page
+                            buffer_3Bytes[1] = _LOW_COLUMN_ADDRESS | (column & 0x0f)
+                            buffer_3Bytes[2] = _HIGH_COLUMN_ADDRESS | (column >> 4)
+                            self.write_command(buffer_3Bytes)
+                            self.write_data(db_mv[start : end])
+                            shadow_mv[start : end] = db_mv[start : end]
+                            if step:
+                                self._end_transfer()
+                                yield
+                                self._begin_transfer()
+                    current_page <<= 1
+            else:
+                row_bytes = w // 8
+                for start_row in range(0, p * 8, 8):
+                    if pages_to_update & current_page:
+                        if whole:
+                            (x0, x1) = (0, row_bytes)
+                        else:
+                            page = start_row >> 3
+                            (x0, x1) = (dirty_x0[page], dirty_x1[page] + 1)
+                        for row in range(start_row, start_row + 8):
+                            slice_start = row * row_bytes
+                            (start, end) = (slice_start + x0, slice_start + x1)
+                            if diff:
+                                (start, end) = _diff_span(db, shadow, start, end)
+                            if start < end:
+                                # each byte of a row is one page of the display column,
+                                # so a partial row starts at the page of its first byte
+                                column = base + row
+                                buffer_3Bytes[0] = _SET_PAGE_ADDRESS | (start - slice_start)
+                                buffer_3Bytes[1] = column & 0x0f  # low column (low col. cmd is 0x00)
+                                buffer_3Bytes[2] = _HIGH_COLUMN_ADDRESS | (column >> 4)
+                                self.write_command(buffer_3Bytes)
+                                self.write_data(db_mv[start : end])
+                                shadow_mv[start : end] = db_mv[start : end]
+                        if step:
+                            self._end_transfer()
+                            yield
+                            self._begin_transfer()
+                    current_page <<= 1
+        finally:
+            self._end_transfer()
+        if full_update:
+            self._shadow_valid[half] = True
+        if frame == self._frame:
+            # no other show wrote the display RAM in between
+            self._last_half = half
+        if half != self._front:
+            self.display_start_line(base)
+            self._front = half
+
+    def _begin_transfer(self):
+        # called before the commands and data of a show are written
+        pass
+
+    def _end_transfer(self):
+        # called after the commands and data of a show are written, even if one failed
+        pass
 
     def pixel(self, x, y, c=None):
         if c is None:
             return super().pixel(x, y)
         else:
             super().pixel(x, y , c)
-            page = y // 8
-            self.pages_to_update |= 1 << page
+            self.register_updates(y, y, x, x)
 
     def text(self, text, x, y, c=1):
         super().text(text, x, y, c)
-        self.register_updates(y, y + 7)
+        self.register_updates(y, y + 7, x, x + 8 * len(text) - 1)
 
     def line(self, x0, y0, x1, y1, c):
         super().line(x0, y0, x1, y1, c)
-        self.register_updates(y0, y1)
+        self.register_updates(y0, y1, x0, x1)
 
     def hline(self, x, y, w, c):
         super().hline(x, y, w, c)
-        self.register_updates(y)
+        self.register_updates(y, y, x, x + w - 1)
 
     def vline(self, x, y, h, c):
         super().vline(x, y, h, c)
-        self.register_updates(y, y + h - 1)
+        self.register_updates(y, y + h - 1, x, x)
 
     def fill(self, c):
         super().fill(c)
-        self.pages_to_update = (1 << self.pages) - 1
+        self.register_updates(0, self.height - 1)
 
     def blit(self, fbuf, x, y, key=-1, palette=None):
         super().blit(fbuf, x, y, key, palette)
-        self.register_updates(y, y + self.height)
+        if isinstance(fbuf, tuple):
+            # (buffer, width, height, format[, stride]) has its size, a FrameBuffer does not expose it
+            self.register_updates(y, y + fbuf[2] - 1, x, x + fbuf[1] - 1)
+        else:
+            self.register_updates(y, y + self.height, x)
 
     def scroll(self, x, y):
         # my understanding is that scroll() does a full screen change
         super().scroll(x, y)
-        self.pages_to_update = (1 << self.pages) - 1
+        self.register_updates(0, self.height - 1)
 
     # rect() and fill_rect() amended to be compatible with new rect() method
     # from latest micropython as well as 1.20.0 and previous versions
@@ -300,7 +441,7 @@ class SH1107(framebuf.FrameBuffer):
             super().fill_rect(x, y, w, h, c)
         except:
             super().rect(x, y, w, h, c, f=True)
-        self.register_updates(y, y + h - 1)
+        self.register_updates(y, y + h - 1, x, x + w - 1)
 
     def rect(self, x, y, w, h, c, f=None):
         if f == None or f == False:
@@ -310,15 +451,15 @@ class SH1107(framebuf.FrameBuffer):
                 super().rect(x, y, w, h, c, f)
             except:
                 super().fill_rect(x, y, w, h, c)
-        self.register_updates(y, y + h - 1)
+        self.register_updates(y, y + h - 1, x, x + w - 1)
     
     def ellipse(self, x, y, xr, yr, c, *args, **kwargs):
         super().ellipse(x, y, xr, yr, c, *args, **kwargs)
-        self.register_updates(y - yr, y + yr)
+        self.register_updates(y - yr, y + yr, x - xr, x + xr)
 
     def poly(self, *args, **kwargs):
         super().poly(*args, **kwargs)
-        self.pages_to_update = (1 << self.pages) - 1
+        self.register_updates(0, self.height - 1)
 
     # conditionally define optimisations for framebuf extension if loaded
     if _fb_variant == 2:
@@ -327,33 +468,53 @@ class SH1107(framebuf.FrameBuffer):
                 super().large_text(s, x, y, m, c, r, *args, **kwargs)
             except:
                 raise Exception("extended framebuffer v206+ required")
-            h = (8 * m) * (1 if r is None or r % 360 // 90 in (0, 2) else len(s))
-            self.register_updates(y, y + h - 1)
+            horizontal = r is None or r % 360 // 90 in (0, 2)
+            h = (8 * m) * (1 if horizontal else len(s))
+            w = (8 * m) * (len(s) if horizontal else 1)
+            self.register_updates(y, y + h - 1, x, x + w - 1)
 
         def circle(self, x, y, radius, c, f:bool = False):
             super().circle(x, y, radius, c, f)
-            self.register_updates(y-radius, y+radius)
+            self.register_updates(y-radius, y+radius, x-radius, x+radius)
         
         def triangle(self, x0, y0, x1, y1, x2, y2, c, f: bool = False):
             super().triangle(x0, y0, x1, y1, x2, y2, c, f)
-            self.register_updates(min(y0, y1, y2), max(y0, y1, y2))
-
-    def register_updates(self, y0, y1=None):
-        y1 = min((y1 if y1 is not None else y0), self.height - 1)
-        # this function takes the top and optional bottom address of the changes made
-        # and updates the pages_to_change list with any changed pages
-        # that are not yet on the list
-        start_page = y0 // 8
-        end_page = (y1 // 8) if (y1 is not None) else start_page
-        # rearrange start_page and end_page if coordinates were given from bottom to top
-        if start_page > end_page:
-            start_page, end_page = end_page, start_page
-        # ensure that start and end page values for update are non-negative (-ve is off-screen)
-        if end_page >= 0:
-            if start_page < 0:
-                start_page = 0
-            for page in range(start_page, end_page + 1):
+            self.register_updates(min(y0, y1, y2), max(y0, y1, y2), min(x0, x1, x2), max(x0, x1, x2))
+
+    def register_updates(self, y0, y1=None, x0=0, x1=None):
+        # this function takes the top and optional bottom address of the changes made,
+        # and optionally their left and right address (default: the full width),
+        # and adds the changed pages to pages_to_update and the changed span to
+        # dirty_x0 and dirty_x1 of each page
+        y1 = y0 if y1 is None else y1
+        x1 = self.width - 1 if x1 is None else x1
+        # rearrange the coordinates if they were given from bottom to top or right to left
+        if y0 > y1:
+            y0, y1 = y1, y0
+        if x0 > x1:
+            x0, x1 = x1, x0
+        # ignore changes that are entirely off-screen and clip the others to the screen
+        if y1 < 0 or y0 >= self.height or x1 < 0 or x0 >= self.width:
+            return
+        start_page = max(y0, 0) // 8
+        end_page = min(y1, self.height - 1) // 8
+        x0 = max(x0, 0)
+        x1 = min(x1, self.width - 1)
+        if not self.rotate90:
+            # a byte of a row holds 8 pixels
+            x0 >>= 3
+            x1 >>= 3
+        (dirty_x0, dirty_x1) = (self.dirty_x0, self.dirty_x1)
+        for page in range(start_page, end_page + 1):
+            if self.pages_to_update & (1 << page):
+                if x0 < dirty_x0[page]:
+                    dirty_x0[page] = x0
+                if x1 > dirty_x1[page]:
+                    dirty_x1[page] = x1
+            else:
                 self.pages_to_update |= 1 << page
+                dirty_x0[page] = x0
+                dirty_x1[page] = x1
 
     def reset(self, res=None):
         if res is not None:
@@ -395,10 +556,27 @@ class SH1107_SPI(SH1107):
         self.dc = dc
         self.res = res
         self.cs = cs
+        self._bulk = False  # cs is held low by _begin_transfer
         super().__init__(width, height, external_vcc, delay_ms, rotate)
 
-    def write_command(self, cmd):
+    def _begin_transfer(self):
+        # select the display once for the whole push, so every command and data
+        # write in between only sets dc instead of toggling cs around each one
         if self.cs is not None:
+            self.cs(1)
+            self.cs(0)
+        self._bulk = True
+
+    def _end_transfer(self):
+        self._bulk = False
+        if self.cs is not None:
+            self.cs(1)
+
+    def write_command(self, cmd):
+        if self._bulk:
+            self.dc(0)
+            self.spi.write(cmd)
+        elif self.cs is not None:
             self.cs(1)
             self.dc(0)
             self.cs(0)
@@ -409,7 +587,10 @@ class SH1107_SPI(SH1107):
             self.spi.write(cmd)
 
     def write_data(self, buf):
-        if self.cs is not None:
+        if self._bulk:
+            self.dc(1)
+            self.spi.write(buf)
+        elif self.cs is not None:
             self.cs(1)
             self.dc(1)
             self.cs(0)
@@ -0,0 +1,196 @@
+"""A snapshot of the last good board data, kept on flash across restarts.
+
+The last line statuses, weather and departures shown are written to a small
+binary file, so after a reboot the display can show them straight away while
+Wi-Fi, NTP and the API checks are still running. Writes are rate-limited to
+spare the flash.
+
+File layout (little-endian), strings are a byte of length and UTF-8 bytes:
+    header: magic b"TFLS", version (B)
+    status: time (I), weather (str), temperature (f), count (B), then count x (line title, status)
+    departures: time (I), title (str), count (B), then count x (time to station (H), platform, destination)
+Times are seconds since the epoch of the RTC, 0 if the section is empty.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import os
+import struct
+import time
+
+_MAGIC = b"TFLS"
+_VERSION = 1
+
+
+def _pack_str(out: bytearray, string: str) -> None:
+    data = string.encode()[:255]
+    out.append(len(data))
+    out.extend(data)
+
+
+def _unpack_str(data, offset: int) -> tuple[str, int]:
+    n = data[offset]
+    return bytes(data[offset+1:offset+1+n]).decode(), offset + 1 + n
+
+
+class Snapshot:
+    min_write_interval = 300  # seconds between writes to flash
+
+    def __init__(self, path: str = "snapshot.bin") -> None:
+        """
+        Initialize an empty Snapshot stored at `path`.
+
+        Args:
+            path (str, optional): The file on flash. Defaults to "snapshot.bin".
+        """
+        self.path = path
+        self.status_time = 0
+        self.weather = ""
+        self.temperature = float("nan")
+        self.statuses = []  # (line title, status)
+        self.departures_time = 0
+        self.title = ""
+        self.departures = []  # (platform number, time to station in seconds, destination)
+        self._dirty = False
+        self._written = None  # time.ticks_ms() of the last write
+
+    def update_status(self, line_titles: list[str], statuses: list[str], weather: str, temperature: float, age: int = 0) -> None:
+        """
+        Replace the line statuses and weather, to be written on the next `flush()`.
+
+        Args:
+            line_titles (list[str]): The line titles.
+            statuses (list[str]): The status of each line.
+            weather (str): The weather description.
+            temperature (float): The temperature.
+            age (int, optional): Seconds since the statuses were fetched. Defaults to 0.
+        """
+        self.status_time = int(time.time()) - age
+        self.statuses = list(zip(line_titles, statuses))
+        self.weather = weather
+        self.temperature = temperature
+        self._dirty = True
+
+    def update_departures(self, title: str, departures: list[tuple[str, int, str]], age: int = 0) -> None:
+        """
+        Replace the departures, to be written on the next `flush()`.
+
+        Args:
+            title (str): The title of the departure board.
+            departures (list[tuple]): (platform number, time to station in seconds, destination) of each
+                departure, at the time of the fetch.
+            age (int, optional): Seconds since the departures were fetched. Defaults to 0.
+        """
+        self.departures_time = int(time.time()) - age
+        self.title = title
+        self.departures = departures
+        self._dirty = True
+
+    def age(self, saved: int) -> int | None:
+        """
+        Get the age of a section from its time.
+
+        Args:
+            saved (int): The time of the section, e.g. `status_time`.
+
+        Returns:
+            int or None: Seconds since the section was updated, or None if the clock is behind it
+            (not synchronised since a power cycle).
+        """
+        age = int(time.time()) - saved
+        return age if age >= 0 else None
+
+    def flush(self, force: bool = False) -> bool:
+        """
+        Write the snapshot to flash if it changed and `min_write_interval` has passed since the last write.
+
+        Args:
+            force (bool, optional): Write now regardless of the interval. Defaults to False.
+
+        Returns:
+            bool: True if the snapshot was written.
+        """
+        if not self._dirty:
+            return False
+        if not force and self._written is not None and \
+                time.ticks_diff(time.ticks_ms(), self._written) < self.min_write_interval * 1000:
+            return False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(self._encode())
+            os.rename(tmp, self.path)  # never leave a half-written snapshot
+        except OSError as e:
+            print(f"Snapshot write failed: {e}")
+            return False
+        self._dirty = False
+        self._written = time.ticks_ms()
+        return True
+
+    def load(self) -> bool:
+        """
+        Read the snapshot from flash.
+
+        Returns:
+            bool: True if a valid snapshot was read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            self._decode(data)
+        except (OSError, ValueError, IndexError, UnicodeError) as e:
+            print(f"No snapshot: {e}")
+            return False
+        return True
+
+    def _encode(self) -> bytes:
+        out = bytearray(_MAGIC)
+        out.append(_VERSION)
+        out.extend(struct.pack("<I", self.status_time))
+        _pack_str(out, self.weather)
+        out.extend(struct.pack("<fB", self.temperature, len(self.statuses)))
+        for line_title, status in self.statuses:
+            _pack_str(out, line_title)
+            _pack_str(out, status)
+        departures = self.departures[:255]
+        out.extend(struct.pack("<I", self.departures_time))
+        _pack_str(out, self.title)
+        out.append(len(departures))
+        for platform_number, time_to_station, destination in departures:
+            out.extend(struct.pack("<H", min(time_to_station, 0xffff)))
+            _pack_str(out, platform_number)
+            _pack_str(out, destination)
+        return bytes(out)
+
+    def _decode(self, data) -> None:
+        if data[:4] != _MAGIC or data[4] != _VERSION:
+            raise ValueError("bad snapshot header")
+        data = memoryview(data)
+        status_time = struct.unpack_from("<I", data, 5)[0]
+        weather, offset = _unpack_str(data, 9)
+        temperature, count = struct.unpack_from("<fB", data, offset)
+        offset += 5
+        statuses = []
+        for _ in range(count):
+            line_title, offset = _unpack_str(data, offset)
+            status, offset = _unpack_str(data, offset)
+            statuses.append((line_title, status))
+        departures_time = struct.unpack_from("<I", data, offset)[0]
+        title, offset = _unpack_str(data, offset + 4)
+        count = data[offset]
+        offset += 1
+        departures = []
+        for _ in range(count):
+            time_to_station = struct.unpack_from("<H", data, offset)[0]
+            platform_number, offset = _unpack_str(data, offset + 2)
+            destination, offset = _unpack_str(data, offset)
+            departures.append((platform_number, time_to_station, destination))
+
+        self.status_time = status_time
+        self.weather = weather
+        self.temperature = temperature
+        self.statuses = statuses
+        self.departures_time = departures_time
+        self.title = title
+        self.departures = departures
@@ -0,0 +1,104 @@
+"""Supervision of the app: warm restarts after transient errors.
+
+A failure is transient if it comes from the network, a bad response or a
+temporary shortage of memory. A Supervisor restarts the failed coroutine (a
+board, or the main menu) in place after such a failure, keeping the display,
+the Wi-Fi association, the clock and every cache. Other failures, or too many
+transient ones in a short time, are raised to the caller for a cold restart.
+
+@Author: HCui91
+@Repo: https://github.com/HCui91/pico_tfl_departure_board
+"""
+
+import gc
+import time
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+from circuit import TRANSIENT_ERRORS
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Check whether an error is worth a warm restart.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        bool: True for network, response and memory errors, False for anything else (e.g. a bug).
+    """
+    return isinstance(error, TRANSIENT_ERRORS) or isinstance(error, MemoryError)
+
+
+class Supervisor:
+    max_restarts = 5  # warm restarts allowed within `window` before giving up
+    window = 300  # seconds
+    max_delay = 30  # longest wait before a warm restart, in seconds
+
+    def __init__(self, name: str) -> None:
+        """
+        Initialize a Supervisor with no restarts recorded.
+
+        Args:
+            name (str): What is supervised, used in messages.
+        """
+        self.name = name
+        self._restarts = []  # time.ticks_ms() of the warm restarts within the window
+
+    def restart(self, error: Exception) -> bool:
+        """
+        Record a failure and decide whether to restart warm.
+
+        Args:
+            error (Exception): The error of the failure.
+
+        Returns:
+            bool: True if the failure is transient and the restart budget is not spent.
+        """
+        if not is_transient(error):
+            return False
+        now = time.ticks_ms()
+        self._restarts = [t for t in self._restarts
+                          if time.ticks_diff(now, t) < self.window * 1000]
+        if len(self._restarts) >= self.max_restarts:
+            return False
+        self._restarts.append(now)
+        gc.collect()
+        return True
+
+    def delay(self) -> float:
+        """
+        Get the wait before the next warm restart.
+
+        Returns:
+            float: 0 for the first restart within the window, then doubling from 1 second up to `max_delay`.
+        """
+        n = len(self._restarts)
+        if n <= 1:
+            return 0.
+        return min(2 ** (n - 2), self.max_delay)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a coroutine function, restarting it in place after transient errors.
+
+        Args:
+            func: The coroutine function, e.g. a board
+            *args, **kwargs: Its arguments
+
+        Returns:
+            The return value of `func`.
+
+        Raises:
+            Exception: A fatal error, or a transient one once the restart budget is spent.
+        """
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if not self.restart(e):
+                    raise
+                print(f"{self.name}: {e}, warm restart {len(self._restarts)}/{self.max_restarts}")
+                await asyncio.sleep(self.delay())
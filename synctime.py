@@ -1,5 +1,10 @@
 import ntptime
 import time
+import machine
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 try:
     from configs import NTP_SERVER
@@ -11,29 +16,145 @@ except ImportError:
     TZ_OFFSET = 0
 
 
-def localtime():
+class TimeService:
+    """Wall clock kept in sync with NTP
+
+    The RTC is set by a bounded NTP sync and resynced in the background, less
+    often as the clock proves stable. The drift of the RTC measured between
+    syncs is compensated in `time()`, and `localtime()` is cached for the
+    current second so it can be called every frame.
+    """
+    min_resync_interval = 3600  # seconds, doubled after each successful resync
+    max_resync_interval = 86400
+    retry_interval = 300  # seconds before retrying a failed resync
+    drift_smoothing = 0.5  # weight of the latest measurement in the drift rate
+    min_drift_window = 600  # seconds between syncs needed to measure the drift
+
+    def __init__(self, host=NTP_SERVER, tz_offset=TZ_OFFSET):
+        """
+        Parameters
+        ----------
+        host : str, optional
+            NTP server, defaults to NTP_SERVER in configs.py
+        tz_offset : int, optional
+            timezone offset in hours, defaults to TZ_OFFSET in configs.py
+        """
+        self.host = host
+        self.tz_offset = tz_offset
+        self.drift = 0.  # RTC error gained per second, in seconds
+        self.synced_at = None  # NTP time of the last sync, in seconds since the epoch
+        self.syncs = 0  # successful syncs
+        self.interval = self.min_resync_interval
+        self._cached_secs = None
+        self._cached_localtime = None
+
+    def sync(self, max_try=2):
+        """Set the RTC from NTP, trying at most `max_try` times
+
+        Parameters
+        ----------
+        max_try : int, optional
+            number of NTP requests before giving up, defaults to 2
+
+        Returns
+        -------
+        bool, True if the RTC was set
+        """
+        ntptime.host = self.host
+        for tries in range(1, max_try + 1):
+            try:
+                ntp_secs = ntptime.time()
+            except Exception as e:
+                print(f"NTP: {e}, try {tries}/{max_try}")
+                time.sleep(0.5)
+                continue
+            rtc_secs = int(time.time())
+            if self.synced_at is not None and ntp_secs - self.synced_at >= self.min_drift_window:
+                # the RTC has been free running since the last sync
+                drift = (rtc_secs - ntp_secs) / (ntp_secs - self.synced_at)
+                self.drift += (drift - self.drift) * self.drift_smoothing
+            tm = time.gmtime(ntp_secs)
+            machine.RTC().datetime(
+                (tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+            print(f"NTP: clock off by {rtc_secs - ntp_secs}s, drift {self.drift * 1e6:.1f}ppm")
+            self.synced_at = ntp_secs
+            self.syncs += 1
+            self._cached_secs = None
+            return True
+        return False
+
+    def time(self):
+        """Seconds since the epoch, corrected for the RTC drift since the last sync
+
+        Returns
+        -------
+        int, seconds since the epoch
+        """
+        secs = int(time.time())
+        if self.synced_at is not None and self.drift:
+            secs -= round((secs - self.synced_at) * self.drift)
+        return secs
+
+    def localtime(self):
+        """Local time with timezone offset, cached for the current second
+
+        Returns
+        -------
+        tupled time.localtime() with timezone offset added
+        """
+        secs = self.time()
+        if secs != self._cached_secs:
+            self._cached_localtime = time.localtime(secs + self.tz_offset * 3600)
+            self._cached_secs = secs
+        return self._cached_localtime
+
+    async def run(self, call=None):
+        """Resync in the background, every `min_resync_interval` doubling up to `max_resync_interval`
+
+        Parameters
+        ----------
+        call : coroutine function, optional
+            runs the sync, e.g. on the network thread, defaults to calling it directly
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            if call is not None:
+                synced = await call(self.sync, 1)
+            else:
+                synced = self.sync(1)
+            if synced:
+                self.interval = min(max(self.interval * 2, self.min_resync_interval),
+                                    self.max_resync_interval)
+            else:
+                self.interval = self.retry_interval
+
+
+clock = TimeService()
+
+
+def localtime(secs=None):
     """localtime wrapper to add timezone offset
 
+    Parameters
+    ----------
+    secs : int, optional
+        seconds since the epoch, defaults to now (the cached, drift corrected clock.localtime())
+
     Returns
     -------
     tupled time.localtime() with timezone offset added
     """
-    return time.localtime(time.time() + TZ_OFFSET * 3600)
+    if secs is None:
+        return clock.localtime()
+    return time.localtime(secs + TZ_OFFSET * 3600)
 
 
 def sync_time(max_try=3):
-    print(f"Time before sync: {time.localtime()}")
-    ntptime.host = NTP_SERVER
-    tries = 1
-    while tries <= max_try:
-        # ntp throws an error if it does not need to sync, so we can ignore the exception
-        try:
-            ntptime.settime()
-        except Exception as e:
-            print(f"{e}, try {tries}/{max_try}")
-            print(f"Time: {time.localtime()}")
-            tries += 1
-            time.sleep(0.5)
-            continue
-    print(f"Time after sync: {time.localtime()} after {tries} tries")
+    """Set the RTC from NTP, see TimeService.sync
+
+    Returns
+    -------
+    tupled time.localtime() after the sync
+    """
+    clock.sync(max_try)
     return time.localtime()
@@ -2,25 +2,49 @@
 
 This module provides a simple wrapper for the TFL API. It allows for testing 
 the connection to the API, getting the status of a given line, and getting 
-arrival predictions for a given line and station.
+arrival predictions for a given line and station. Every endpoint has a
+circuit breaker; while one is failing, the last good data is served instead.
 
 @Author: HCui91
 @Repo: https://github.com/HCui91/pico_tfl_departure_board
 """
 
-import urequests
-import ujson
+import time
+from jsonstream import extract, BadResponse
+from httpclient import HTTPClient
+from arrivals import Arrivals, StringTable
+from circuit import CircuitBreaker, TRANSIENT_ERRORS
+from ratelimit import FOREGROUND
+
+# keys read from the TFL API responses, everything else is skipped while parsing
+_STATUS_KEYS = ["id", "statusSeverityDescription"]
+_ARRIVAL_KEYS = ["lineId", "vehicleId", "platformName", "timeToStation", "towards"]
 
 
 class TFLWrapper:
-    def __init__(self, app_key: str) -> None:
+    status_ttl = 300  # seconds a cached line status stays valid
+
+    def __init__(self, app_key: str, http: HTTPClient | None = None) -> None:
         """
         Initialize the TFLWrapper class with the provided app_key.
 
         Args:
             app_key (str): The TFL API app key.
+            http (HTTPClient, optional): The HTTP client to share with other API wrappers. Defaults to None (a new client).
         """
         self.app_key = app_key
+        self.http = http if http is not None else HTTPClient()
+        self._status_cache = {}  # line ID -> (full status, time.ticks_ms() of the fetch)
+        self._invalidated = set()  # cached line IDs to fetch again on the next call
+        self._last_arrivals = {}  # query -> last good Arrivals, served while the endpoint is failing
+        self.breakers = {}  # endpoint name -> CircuitBreaker
+        self.strings = StringTable()  # platform numbers and destinations, shared by every fetch
+
+    def _breaker(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name)
+        return breaker
 
     def test_connection(self) -> bool | int:
         """
@@ -30,30 +54,36 @@ class TFLWrapper:
             bool or int: True if the connection is successful, otherwise the HTTP status code.
         """
         url = f"https://api.tfl.gov.uk/Line/Meta/Modes?app_key={self.app_key}"
-        response = urequests.get(url)
+        response = self.http.get(url)
         response.close()
         if response.status_code == 200:
             return True
         else:
             return response.status_code
 
-    def _fetch_status(self, line: str, short: bool = True) -> str:
+    def _fetch_status(self, line: str, short: bool = True, priority: int = FOREGROUND) -> str:
         """
         Get the status of a given line.
 
         Args:
             line (str): The line ID.
             short (bool, optional): Whether to return the status in a short form. Defaults to True.
+            priority (int, optional): The rate limiter priority of the request. Defaults to FOREGROUND.
 
         Returns:
             str: The status of the line.
         """
         url = f"https://api.tfl.gov.uk/Line/{
             line}/Status?app_key={self.app_key}"
-        response = urequests.get(url)
-        data = response.json()
-        response.close()
-        status = str(data[0]['lineStatuses'][0]['statusSeverityDescription'])
+        response = self.http.get(url, priority=priority)
+        response.raise_for_status()
+        try:
+            record = next(extract(response, _STATUS_KEYS), None)
+        finally:
+            response.close()
+        if record is None or 'statusSeverityDescription' not in record:
+            raise BadResponse(f"no status for {line}")
+        status = str(record['statusSeverityDescription'])
 
         if short:
             if status == "Good Service":
@@ -63,7 +93,72 @@ class TFLWrapper:
         else:
             return status
 
-    def _fetch_arrivals(self, line: str, stationId: str, direction: str = "all", sort: bool = True) -> tuple[list[str], list[int], list[str]]:
+    def _fetch_statuses(self, lines: list[str], short: bool = True, priority: int = FOREGROUND) -> list[str]:
+        """
+        Get the status of multiple lines in a single request.
+
+        Args:
+            lines (list[str]): A list of line IDs.
+            short (bool, optional): Whether to return the status in a short form. Defaults to True.
+            priority (int, optional): The rate limiter priority of the request. Defaults to FOREGROUND.
+
+        Returns:
+            list[str]: The status of each line, in the same order as `lines`.
+            Lines missing from the response are reported as "Unknown".
+        """
+        url = f"https://api.tfl.gov.uk/Line/{
+            ','.join(lines)}/Status?app_key={self.app_key}"
+        response = self.http.get(url, priority=priority)
+        response.raise_for_status()
+        statuses = {}
+        try:
+            for line in extract(response, _STATUS_KEYS):
+                if 'id' in line and 'statusSeverityDescription' in line:
+                    statuses[line['id']] = str(
+                        line['statusSeverityDescription'])
+        finally:
+            response.close()
+
+        status = []
+        for line in lines:
+            line_status = statuses.get(line, "Unknown")
+            if short and line_status == "Good Service":
+                line_status = "Good"
+            status.append(line_status)
+        return status
+
+    def _read_arrivals(self, url: str, arrivals: Arrivals, lines: list[str] | None = None, direction: str = "all", priority: int = FOREGROUND) -> None:
+        """
+        Fetch arrival predictions and add the matching ones to a container as they are parsed.
+
+        Args:
+            url (str): The arrivals URL.
+            arrivals (Arrivals): The container to add the predictions to.
+            lines (list[str], optional): Only keep these line IDs. Defaults to None (all lines).
+            direction (str, optional): The direction of the arrivals (first word of the platform name). Defaults to "all".
+            priority (int, optional): The rate limiter priority of the request. Defaults to FOREGROUND.
+        """
+        response = self.http.get(url, priority=priority)
+        response.raise_for_status()
+        try:
+            for arrival in extract(response, _ARRIVAL_KEYS):
+                try:
+                    if lines is not None and arrival['lineId'] not in lines:
+                        continue
+                    platform_name = arrival['platformName'].split()
+                    if direction != "all":
+                        if platform_name[0] != direction:
+                            continue
+                    platform_number = str(platform_name[-1])
+                    time_to_station = int(arrival['timeToStation'])
+                    towards = str(arrival['towards'])
+                except (KeyError, IndexError, ValueError, TypeError, AttributeError) as e:
+                    raise BadResponse(f"bad arrival {arrival}: {e}")
+                arrivals.add(platform_number, time_to_station, towards, arrival.get('vehicleId'))
+        finally:
+            response.close()
+
+    def _fetch_arrivals(self, line: str, stationId: str, direction: str = "all", sort: bool = True, limit: int | None = None, priority: int = FOREGROUND) -> Arrivals:
         """
         Get arrival predictions for a given line and station.
 
@@ -72,76 +167,181 @@ class TFLWrapper:
             stationId (str): The station ID.
             direction (str, optional): The direction of the arrivals (first word of the platform name). Defaults to "all".
             sort (bool, optional): Whether to sort the predictions by time_to_station. Defaults to True.
+            limit (int, optional): Only return the `limit` soonest predictions. Defaults to None (all).
+            priority (int, optional): The rate limiter priority of the request. Defaults to FOREGROUND.
 
         Returns:
-            tuple: A tuple containing lists of platform numbers, time to station, and destination.
+            Arrivals: The platform numbers, time to station, and destination of the predictions.
         """
         url = f"https://api.tfl.gov.uk/Line/{line}/Arrivals/{
             stationId}?direction=all&app_key={self.app_key}"
-        response = urequests.get(url)
-        data = response.json()
-        response.close()
+        arrivals = Arrivals(self.strings, limit, sort=sort)
+        self._read_arrivals(url, arrivals, direction=direction, priority=priority)
+        return arrivals
+
+    def _fetch_stop_arrivals(self, lines: list[str], stationId: str, direction: str = "all", sort: bool = True, limit: int | None = None, priority: int = FOREGROUND) -> Arrivals:
+        """
+        Get arrival predictions for several lines at a station in a single request.
 
-        platform_number = []
-        time_to_station = []
-        destinations = []
-        for arrival in data:
-            platform_name = arrival['platformName'].split()
-            if direction is not "all":
-                if platform_name[0] != direction:
-                    continue
-            platform_number.append(str(platform_name[-1]))
-            time_to_station.append(int(arrival['timeToStation']))
-            destinations.append(str(arrival['towards']))
+        All arrivals at the stop point are fetched and then filtered by line ID and direction.
 
-        if sort:
-            time_to_station, platform_number, destinations = zip(
-                *sorted(zip(time_to_station, platform_number, destinations)))
+        Args:
+            lines (list[str]): A list of line IDs.
+            stationId (str): The station ID.
+            direction (str, optional): The direction of the arrivals (first word of the platform name). Defaults to "all".
+            sort (bool, optional): Whether to sort the predictions by time_to_station. Defaults to True.
+            limit (int, optional): Only return the `limit` soonest predictions. Defaults to None (all).
+            priority (int, optional): The rate limiter priority of the request. Defaults to FOREGROUND.
 
-        return platform_number, time_to_station, destinations
+        Returns:
+            Arrivals: The platform numbers, time to station, and destination of the predictions.
+        """
+        url = f"https://api.tfl.gov.uk/StopPoint/{
+            stationId}/Arrivals?app_key={self.app_key}"
+        arrivals = Arrivals(self.strings, limit, sort=sort)
+        self._read_arrivals(url, arrivals, lines=lines, direction=direction, priority=priority)
+        return arrivals
 
-    def line_status(self, lines: list[str], short: bool = True) -> list[str]:
+    def line_status(self, lines: list[str], short: bool = True, batch: bool = True, priority: int = FOREGROUND) -> list[str]:
         """
         Get the status of multiple lines.
 
+        Statuses are cached for `status_ttl` seconds and shared by every caller, so only
+        lines without a valid cached status are fetched. If the fetch fails, the expired
+        cached statuses are returned instead; see `status_age()`.
+
         Args:
             lines (List[str]): A list of line IDs.
             short (bool, optional): Whether to return the status in a short form. Defaults to True.
+            batch (bool, optional): Whether to fetch all lines in one request. Defaults to True.
+            priority (int, optional): The rate limiter priority of the requests. Defaults to FOREGROUND.
 
         Returns:
             List[str]: A list of the status of the lines.
+
+        Raises:
+            Exception: The error of the fetch, if a line has no cached status to fall back on.
         """
+        now = time.ticks_ms()
+        stale = []
+        for line in lines:
+            cached = self._status_cache.get(line)
+            if cached is None or line in self._invalidated or time.ticks_diff(now, cached[1]) > self.status_ttl * 1000:
+                stale.append(line)
+
+        fetched = {}
+        if stale:
+            try:
+                if batch:
+                    results = self._breaker("line status").call(
+                        self._fetch_statuses, stale, short=False, priority=priority)
+                else:
+                    results = self._breaker("line status").call(
+                        lambda: [self._fetch_status(line, short=False, priority=priority) for line in stale])
+            except TRANSIENT_ERRORS:
+                for line in lines:
+                    if line not in self._status_cache:
+                        raise
+                results = []  # serve the last good statuses
+            for line, line_status in zip(stale, results):
+                fetched[line] = line_status
+                if line_status != "Unknown":  # missing lines are retried next time
+                    self._status_cache[line] = (line_status, now)
+                    self._invalidated.discard(line)
+
         status = []
         for line in lines:
-            status.append(self._fetch_status(line, short=short))
+            if line in fetched:
+                line_status = fetched[line]
+            else:
+                line_status = self._status_cache[line][0]
+            if short and line_status == "Good Service":
+                line_status = "Good"
+            status.append(line_status)
         return status
 
-    def arrival_predict(self, lines: list[str], stationId: str, direction: str = "all", sort: bool = True) -> tuple[list[str], list[int], list[str]]:
+    def invalidate_status(self, lines: list[str] | None = None) -> None:
+        """
+        Mark cached line statuses so they are fetched again on the next call.
+
+        The cached statuses are kept to fall back on if that fetch fails.
+
+        Args:
+            lines (list[str], optional): The line IDs to invalidate. Defaults to None (all lines).
+        """
+        if lines is None:
+            lines = self._status_cache
+        for line in lines:
+            if line in self._status_cache:
+                self._invalidated.add(line)
+
+    def status_age(self, lines: list[str]) -> int | None:
+        """
+        Get the age of the oldest cached status of the given lines.
+
+        Args:
+            lines (list[str]): A list of line IDs.
+
+        Returns:
+            int or None: Seconds since the oldest of the statuses was fetched, or None if a line has none.
+        """
+        now = time.ticks_ms()
+        age = 0
+        for line in lines:
+            cached = self._status_cache.get(line)
+            if cached is None:
+                return None
+            age = max(age, time.ticks_diff(now, cached[1]) // 1000)
+        return age
+
+    def arrival_predict(self, lines: list[str], stationId: str, direction: str = "all", sort: bool = True, single_request: bool = True, limit: int | None = None, max_age: int | None = None, priority: int = FOREGROUND) -> Arrivals:
         """
         Get arrival predictions for multiple lines at a given station. Useful for station platforms that serve multiple lines.
 
+        Predictions are merged into a container of at most `limit` entries while they are parsed,
+        so memory and sorting cost depend on the number of rows displayed, not on the size of the response.
+        If the fetch fails, the last good predictions for the same query are returned instead,
+        with their `fetched` tick left unchanged so their age shows.
+
         Args:
             lines (List[str]): A list of line IDs.
             stationId (str): The station ID.
             direction (str, optional): The direction of the arrivals. Defaults to None.
             sort (bool, optional): Whether to sort the predictions by time_to_station. Defaults to True.
+            single_request (bool, optional): Whether to fetch all lines with one StopPoint request. Defaults to True.
+            limit (int, optional): Only return the `limit` soonest predictions. Defaults to None (all).
+            max_age (int, optional): Return the last good predictions for the same query without a request
+                if they were fetched at most `max_age` seconds ago, e.g. when prefetched. Defaults to None (always fetch).
+            priority (int, optional): The rate limiter priority of the requests. Defaults to FOREGROUND.
 
         Returns:
-            tuple: A tuple containing lists of platform numbers, time to station, and towards.
-        """
-        platform_number = []
-        time_to_station = []
-        towards = []
+            Arrivals: The platform numbers, time to station, and towards of the predictions.
 
-        for line in lines:
-            line_platform_number, line_time_to_station, line_towards = self._fetch_arrivals(
-                line, stationId, direction=direction, sort=False)
-            platform_number += line_platform_number
-            time_to_station += line_time_to_station
-            towards += line_towards
+        Raises:
+            Exception: The error of the fetch, if there are no earlier predictions to fall back on.
+        """
+        query = f"{stationId} {direction} {','.join(lines)}"
+        last = self._last_arrivals.get(query)
+        if max_age is not None and last is not None and \
+                time.ticks_diff(time.ticks_ms(), last.fetched) <= max_age * 1000:
+            return last
+        try:
+            arrivals = self._breaker(f"arrivals {stationId}").call(
+                self._fetch_predictions, lines, stationId, direction, sort, single_request, limit, priority)
+        except TRANSIENT_ERRORS:
+            if last is None:
+                raise
+            return last
+        self._last_arrivals[query] = arrivals
+        return arrivals
 
-        if sort:
-            time_to_station, platform_number, towards = zip(
-                *sorted(zip(time_to_station, platform_number, towards)))
+    def _fetch_predictions(self, lines: list[str], stationId: str, direction: str, sort: bool, single_request: bool, limit: int | None, priority: int) -> Arrivals:
+        if single_request:
+            return self._fetch_stop_arrivals(lines, stationId, direction=direction, sort=sort, limit=limit, priority=priority)
 
-        return platform_number, time_to_station, towards
+        arrivals = Arrivals(self.strings, limit, sort=sort)
+        for line in lines:
+            url = f"https://api.tfl.gov.uk/Line/{line}/Arrivals/{
+                stationId}?direction=all&app_key={self.app_key}"
+            self._read_arrivals(url, arrivals, direction=direction, priority=priority)
+        return arrivals
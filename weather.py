@@ -2,14 +2,16 @@
 
 This module provides a simple wrapper for the OpenWeather API. It allows for
 testing the connection to the API, and getting the current weather and temperature.
-Temperature and weather data are cached until they are expired.
+Temperature and weather data are cached until they are expired, and kept
+while the API is failing, behind a circuit breaker.
 
 @Author: HCui91
 @Repo: https://github.com/HCui91/pico_tfl_departure_board
 """
-import urequests
-import ujson
 import time
+from httpclient import HTTPClient, HTTPError
+from circuit import CircuitBreaker, TRANSIENT_ERRORS
+from ratelimit import FOREGROUND
 
 
 class OpenWeatherWrapper:
@@ -19,31 +21,34 @@ class OpenWeatherWrapper:
     temperature = float("nan")
     update_interval = 600
 
-    def __init__(self, api_key, lat, lon):
+    def __init__(self, api_key, lat, lon, http=None):
+        self.http = http if http is not None else HTTPClient()
+        self.breaker = CircuitBreaker("weather")
         self.url = f"https://api.openweathermap.org/data/2.5/weather?lat={
             lat}&lon={lon}&appid={api_key}&units=metric"
 
     def test_connection(self):
         """
-        Test the connection to the OpenWeather API
+        Test the connection to the OpenWeather API, keeping the weather data it fetches
         """
-        response = urequests.get(self.url)
-        response.close()
-
-        if response.status_code == 200:
-            return True
-        else:
-            return response.status_code
+        try:
+            self._fetch_weather()
+        except HTTPError as e:
+            return e.status_code
+        return True
 
-    def _fetch_weather(self):
+    def _fetch_weather(self, priority=FOREGROUND):
         """
-        Fetch the weather data from the OpenWeather API
+        Fetch the weather data from the OpenWeather API, at the given rate limiter priority
         """
-        response = urequests.get(self.url)
-        self.data = response.json()
-        response.close()
-        self.last_update = time.time()
+        response = self.http.get(self.url, priority=priority)
         self.last_status = response.status_code
+        response.raise_for_status()
+        try:
+            self.data = response.json()
+        finally:
+            response.close()
+        self.last_update = time.time()
         try:
             self.weather = self.data['weather'][0]['description']
         except:
@@ -54,20 +59,28 @@ class OpenWeatherWrapper:
             self.temperature = float("nan")
         return
 
-    def get_weather(self):
+    def _update(self, priority=FOREGROUND):
         """
-        Get the weather data from the OpenWeather API
+        Fetch the weather data if it is expired, keeping the old data if the fetch fails
         """
         if self.last_update is None or time.time() - self.last_update > self.update_interval:
-            self._fetch_weather()
+            if not self.breaker.allow():
+                return
+            try:
+                self.breaker.call(self._fetch_weather, priority)
+            except TRANSIENT_ERRORS as e:
+                print(f"Weather update failed: {e}")
 
+    def get_weather(self, priority=FOREGROUND):
+        """
+        Get the weather data from the OpenWeather API, fetching it at the given rate limiter priority if expired
+        """
+        self._update(priority)
         return self.weather
 
-    def get_temperature(self):
+    def get_temperature(self, priority=FOREGROUND):
         """
-        Get the temperature from the OpenWeather API
+        Get the temperature from the OpenWeather API, fetching it at the given rate limiter priority if expired
         """
-        if self.last_update is None or time.time() - self.last_update > self.update_interval:
-            self._fetch_weather()
-
+        self._update(priority)
         return self.temperature
@@ -1,9 +1,23 @@
 import time
 import network
 import ubinascii
+import ujson
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 
 class WiFi:
+    link_path = "wifi.json"  # last access point and IP lease, for a directed reconnect
+    # reconnect with the last IP address instead of waiting for DHCP; off by default as the
+    # lease is only renewed by DHCP, so a reused address may be given to another host
+    reuse_ip = False
+    lease_max_age = 4 * 3600  # seconds after a DHCP connect during which its address is reused
+    directed_timeout = 5  # seconds to wait for a directed reconnect before scanning
+    poll_ms = 20  # status polling interval while connecting
+    watchdog_interval = 5  # seconds between link checks
+
     def __init__(self):
         self.wlan = network.WLAN(network.STA_IF)
         self.wlan.active(True)
@@ -12,27 +26,162 @@ class WiFi:
             self.wlan.config('mac'), ':').decode()
         print(f"MAC = {self.mac}")
         self.status = self.wlan.ifconfig()
+        self.ssid = None
+        self.password = None
+        self.timeout = 10
+        self.reconnects = 0  # links restored by the watchdog
+        self._static = False  # whether the last IP lease is configured
+        self._link = self._load_link()
 
-    def connect(self, ssid, password, timeout=10):
-        self.wlan.connect(ssid, password)
-
-        # Wait for connect or fail
-        while timeout > 0:
-            if self.wlan.status() < 0 or self.wlan.status() >= 3:
-                break
-            timeout -= 1
-            print('waiting for connection...')
-            time.sleep(1)
-
-        # Handle connection error
-        if self.wlan.status() != 3:
+    def _load_link(self):
+        try:
+            with open(self.link_path) as f:
+                return ujson.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_link(self, bssid, channel):
+        if not self.reuse_ip:
+            leased = None
+        elif self._static:
+            leased = self._link["leased"]  # a reused address keeps the time of its DHCP connect
+        else:
+            leased = time.time()
+        link = {"ssid": self.ssid,
+                "bssid": ubinascii.hexlify(bssid).decode() if bssid else None,
+                "channel": channel,
+                "ifconfig": list(self.wlan.ifconfig()),
+                "leased": leased}
+        if link == self._link:
+            return  # spare the flash
+        self._link = link
+        try:
+            with open(self.link_path, "w") as f:
+                ujson.dump(link, f)
+        except OSError as e:
+            print(f"Saving the Wi-Fi link failed: {e}")
+
+    def _scan(self):
+        """
+        Find the strongest access point of the network.
+
+        Returns:
+            tuple: (bssid, channel), or (None, None) if the network was not found.
+        """
+        best = None
+        for ssid, bssid, channel, rssi, *_ in self.wlan.scan():
+            if ssid.decode() == self.ssid and (best is None or rssi > best[2]):
+                best = (bssid, channel, rssi)
+        if best is None:
+            return None, None
+        return best[0], best[1]
+
+    def _lease_valid(self, link):
+        # the RTC may not be set yet after a power cycle, a time before the lease counts as expired
+        leased = link.get("leased")
+        return leased is not None and 0 <= time.time() - leased < self.lease_max_age
+
+    def _attempts(self):
+        """
+        Generate the connection attempts, the directed reconnect to the last access point first.
+
+        The last IP address is only reused if `reuse_ip` is set and it was leased by DHCP
+        less than `lease_max_age` seconds ago; otherwise the directed reconnect uses DHCP.
+
+        Yields:
+            tuple: (bssid, channel, whether to use the last IP lease, timeout in seconds)
+        """
+        link = self._link
+        if link is not None and link["ssid"] == self.ssid and link["bssid"]:
+            static = self.reuse_ip and self._lease_valid(link)
+            yield ubinascii.unhexlify(link["bssid"]), link["channel"], static, self.directed_timeout
+        bssid, channel = self._scan()
+        yield bssid, channel, False, self.timeout
+
+    def _start(self, bssid, channel, static):
+        if self.wlan.status() != 0:
+            self.wlan.disconnect()
+        try:
+            if static:
+                self.wlan.ifconfig(tuple(self._link["ifconfig"]))
+            elif self._static:
+                self.wlan.ifconfig("dhcp")
+            self._static = static
+        except (OSError, TypeError, ValueError) as e:
+            print(f"ifconfig failed: {e}")
+        if bssid is None:
+            self.wlan.connect(self.ssid, self.password)
+            return
+        try:
+            self.wlan.connect(self.ssid, self.password, bssid=bssid, channel=channel)
+        except TypeError:
+            self.wlan.connect(self.ssid, self.password, bssid=bssid)  # port without channel selection
+
+    def _done(self):
+        status = self.wlan.status()
+        return status < 0 or status >= network.STAT_GOT_IP
+
+    def _connected(self, bssid, channel):
+        if self.wlan.status() != network.STAT_GOT_IP:
             print(f"wlan.status() = {self.wlan.status()}")
             return False
-        else:
-            print(f"{ssid} connected")
-            self.status = self.wlan.ifconfig()
-            print(f"ip = {self.status[0]}")
-            return True
+        print(f"{self.ssid} connected")
+        self.status = self.wlan.ifconfig()
+        print(f"ip = {self.status[0]}")
+        self._save_link(bssid, channel)
+        return True
+
+    def connect(self, ssid, password, timeout=10):
+        """
+        Connect to a network, trying a directed reconnect to the last access point first.
+
+        Args:
+            ssid (str): The network name.
+            password (str): The network password.
+            timeout (int, optional): Seconds to wait for a full connect. Defaults to 10.
+
+        Returns:
+            bool: True if connected.
+        """
+        self.ssid = ssid
+        self.password = password
+        self.timeout = timeout
+        for bssid, channel, static, attempt_timeout in self._attempts():
+            self._start(bssid, channel, static)
+            deadline = time.ticks_add(time.ticks_ms(), attempt_timeout * 1000)
+            while not self._done() and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                time.sleep_ms(self.poll_ms)
+            if self._connected(bssid, channel):
+                return True
+        return False
+
+    async def reconnect(self):
+        """
+        Connect again to the last network without blocking the event loop while waiting.
+
+        Returns:
+            bool: True if connected.
+        """
+        for bssid, channel, static, attempt_timeout in self._attempts():
+            self._start(bssid, channel, static)
+            deadline = time.ticks_add(time.ticks_ms(), attempt_timeout * 1000)
+            while not self._done() and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                await asyncio.sleep_ms(self.poll_ms)
+            if self._connected(bssid, channel):
+                return True
+        return False
+
+    async def watchdog(self):
+        """
+        Check the link every `watchdog_interval` seconds and reconnect in place when it is lost.
+        """
+        while True:
+            await asyncio.sleep(self.watchdog_interval)
+            if self.ssid is None or self.wlan.isconnected():
+                continue
+            print("Wi-Fi link lost, reconnecting")
+            if await self.reconnect():
+                self.reconnects += 1
 
     def disconnect(self):
         self.wlan.disconnect()